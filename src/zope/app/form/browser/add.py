@@ -18,34 +18,146 @@ $Id$
 __docformat__ = 'restructuredtext'
 
 import sys
+import transaction
 
 import zope.component
+from zope.component import ComponentLookupError
 from zope.component.interfaces import IFactory
 from zope.event import notify
 from zope.interface import Interface
-from zope.schema.interfaces import ValidationError
+from zope.schema.interfaces import ValidationError, RequiredMissing
 from zope.security.checker import defineChecker, NamesChecker
 from zope.publisher.interfaces.browser import IDefaultBrowserLayer
 from zope.lifecycleevent import ObjectCreatedEvent, ObjectModifiedEvent
 from zope.lifecycleevent import Attributes
 
 from zope.app.form.utility import setUpWidgets, getWidgetsData
+from zope.app.form.utility import setUpLazyWidgets
 from zope.formlib.interfaces import IInputWidget, WidgetsError
+from zope.formlib.interfaces import WidgetInputError, MissingInputError
 from zope.app.form.browser.i18n import _
 from zope.browserpage.simpleviewclass import SimpleViewClass
-from zope.browserpage import ViewPageTemplateFile
 from editview import EditView
 from submit import Update
+from template import sharedTemplate
+from deferred import DeferredViewFactory
+from timing import timed, timedFields
+from headless import readJSONData, convertJSONData, convertData
+from headless import errorMessage
+from headless import widgetsErrors
+
+class ArgumentPlan(object):
+    """How the data of an add form is passed to the new object.
+
+    `arguments` and `keyword_arguments` are the names of the fields passed
+    to the content factory, `set_before_add` and `set_after_add` those set
+    on the object before and after it is added. `keywords` holds
+    ``(name, keyword)`` pairs for the keyword arguments, `before_add` and
+    `after_add` ``(name, field)`` pairs for the fields to set.
+
+    A plan is computed once per add view class and is read-only.
+    """
+
+    __slots__ = ('schema', 'arguments', 'keyword_arguments', 'keywords',
+                 'set_before_add', 'set_after_add', 'before_add',
+                 'after_add')
+
+    def __init__(self, schema, arguments=None, keyword_arguments=None,
+                 set_before_add=None, set_after_add=None):
+        self.schema = schema
+        self.arguments = tuple(arguments or ())
+        self.keyword_arguments = tuple(keyword_arguments or ())
+        self.keywords = tuple([(name, str(name))
+                               for name in self.keyword_arguments])
+        self.set_before_add = tuple(set_before_add or ())
+        self.set_after_add = tuple(set_after_add or ())
+        self.before_add = tuple([(name, schema[name])
+                                 for name in self.set_before_add])
+        self.after_add = tuple([(name, schema[name])
+                                for name in self.set_after_add])
+
+    def _key(self):
+        return (self.schema, self.arguments, self.keyword_arguments,
+                self.set_before_add, self.set_after_add)
+
+    def __eq__(self, other):
+        if not isinstance(other, ArgumentPlan):
+            return False
+        return self._key() == other._key()
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self._key())
+
+
+def makeArgumentPlan(schema, fields, arguments=None, keyword_arguments=None,
+                     set_before_add=None, set_after_add=None, leftover=None):
+    """Returns the `ArgumentPlan` of an add form.
+
+    All names must be in `fields`, and `arguments` must be required
+    fields; `ValueError` is raised otherwise. The `leftover` fields, by
+    default all `fields`, that are not passed or set otherwise are set
+    after adding.
+    """
+    index = frozenset(fields)
+    used = set()
+    for names, what in ((arguments, "arguments"),
+                        (keyword_arguments, "keyword_arguments"),
+                        (set_before_add, "set_before_add"),
+                        (set_after_add, "set_after_add")):
+        if not names:
+            continue
+        missing = [n for n in names if n not in index]
+        if missing:
+            raise ValueError(
+                "Some %s are not included in the form" % what, missing)
+        used.update(names)
+    if arguments:
+        optional = [n for n in arguments if not schema[n].required]
+        if optional:
+            raise ValueError("Some arguments are optional, use"
+                             " keyword_arguments for them",
+                             optional)
+    if leftover is None:
+        leftover = fields
+    leftover = [n for n in leftover if n not in used]
+    return ArgumentPlan(schema, arguments, keyword_arguments, set_before_add,
+                        list(set_after_add or ()) + leftover)
+
 
 class AddView(EditView):
     """Simple edit-view base class.
 
     Subclasses should provide a schema attribute defining the schema
     to be edited.
+
+    The data is passed to the new object as described by the
+    `_argument_plan`, an `ArgumentPlan`. Views without one use the
+    `_arguments`, `_keyword_arguments`, `_set_before_add` and
+    `_set_after_add` attributes.
     """
 
+    _argument_plan = None
+
     def _setUpWidgets(self):
-        setUpWidgets(self, self.schema, IInputWidget, names=self.fieldNames)
+        timedFields(self, 'setup', setUpWidgets, self.fieldNames,
+                    self, self.schema, IInputWidget)
+
+    def _setUpLazyWidgets(self):
+        setUpLazyWidgets(self, self.fieldNames)
+
+    def _setUpWidget(self, name):
+        timedFields(self, 'setup', setUpWidgets, [name],
+                    self, self.schema, IInputWidget)
+
+    def _setUpJSON(self):
+        pass
+
+    def _setUpInline(self):
+        # Add forms are always submitted as a whole
+        pass
 
     def update(self):
 
@@ -53,12 +165,16 @@ class AddView(EditView):
             # We've been called before. Just return the previous result.
             return self.update_status
 
+        if self.json_request:
+            return self._updateJSON()
+
         if Update in self.request:
 
             self.update_status = ''
             try:
-                data = getWidgetsData(self, self.schema, names=self.fieldNames)
-                self.createAndAdd(data)
+                data = timedFields(self, 'validate', getWidgetsData,
+                                   self.fieldNames, self, self.schema)
+                timed(self, 'create', self.createAndAdd, data)
             except WidgetsError, errors:
                 self.errors = errors
                 self.update_status = _("An error occurred.")
@@ -68,6 +184,28 @@ class AddView(EditView):
 
         return self.update_status
 
+    def _updateJSON(self):
+        # Creates the object from the posted JSON object like from
+        # widget input
+        try:
+            data, errors = convertJSONData(
+                self, readJSONData(self.request), required=True)
+        except ValueError, error:
+            errors = {'': errorMessage(error, self.request)}
+        if not errors:
+            try:
+                timed(self, 'create', self.createAndAdd, data)
+            except WidgetsError, error:
+                errors = widgetsErrors(error, self.request)
+        if errors:
+            self.update_status = _("An error occurred.")
+            self.json_result = {'status': 'error', 'errors': errors}
+        else:
+            self.update_status = ''
+            self.json_result = {'status': 'ok', 'errors': {},
+                                'nextURL': self.nextURL()}
+        return self.update_status
+
     def create(self, *args, **kw):
         """Do the actual instantiation."""
         return self._factory(*args, **kw)
@@ -78,26 +216,27 @@ class AddView(EditView):
         The data argument is a dictionary with the data entered in the form.
         """
 
-        args = []
-        if self._arguments:
-            for name in self._arguments:
-                args.append(data[name])
+        plan = self._argument_plan
+        if plan is None:
+            plan = ArgumentPlan(self.schema, self._arguments,
+                                self._keyword_arguments,
+                                self._set_before_add, self._set_after_add)
+
+        args = [data[name] for name in plan.arguments]
 
         kw = {}
-        if self._keyword_arguments:
-            for name in self._keyword_arguments:
-                if name in data:
-                    kw[str(name)] = data[name]
+        for name, keyword in plan.keywords:
+            if name in data:
+                kw[keyword] = data[name]
 
         content = self.create(*args, **kw)
 
         errors = []
 
-        if self._set_before_add:
+        if plan.before_add:
             adapted = self.schema(content)
-            for name in self._set_before_add:
+            for name, field in plan.before_add:
                 if name in data:
-                    field = self.schema[name]
                     try:
                         field.set(adapted, data[name])
                     except ValidationError:
@@ -110,39 +249,141 @@ class AddView(EditView):
 
         content = self.add(content)
 
-        if self._set_after_add:
+        if plan.after_add:
             adapted = self.schema(content)
-            for name in self._set_after_add:
+            changed = []
+            for name, field in plan.after_add:
                 if name in data:
                     if data[name] is not None:
-                        field = self.schema[name]
                         try:
                             field.set(adapted, data[name])
                         except ValidationError:
                             errors.append(sys.exc_info()[1])
+                        else:
+                            changed.append(name)
             # We have modified the object, so we need to publish an
-            # object-modified event:
-            description = Attributes(self.schema, *self._set_after_add)
-            notify(ObjectModifiedEvent(content, description))
+            # object-modified event, describing the fields that were set.
+            # Subscribers rely on the event, so it is sent even if no
+            # field was set, without a description.
+            if self.describe_all_fields:
+                description = Attributes(self.schema, *plan.set_after_add)
+                notify(ObjectModifiedEvent(content, description))
+            elif changed:
+                description = Attributes(self.schema, *changed)
+                notify(ObjectModifiedEvent(content, description))
+            else:
+                notify(ObjectModifiedEvent(content))
 
         if errors:
             raise WidgetsError(*errors)
 
         return content
 
+    def createAndAddAll(self, rows, chunk_size=None, validate=True):
+        """Add an object for each data dictionary in `rows`.
+
+        This calls `createAndAdd` for each dictionary, looking up the
+        content factory only once. `rows` is only iterated once, so it may
+        be a generator reading a large file.
+
+        The values are converted and validated like those of JSON
+        requests first (see `zope.app.form.browser.headless.convertData`),
+        unless `validate` is false; strings are converted with
+        ``fromUnicode``, and unknown or read-only keys are errors.
+
+        Each row is added in its own savepoint: rows raising a
+        `WidgetsError` are rolled back and reported, and the other rows are
+        still added. This requires that all data managers joined to the
+        transaction support savepoints; if a row can't be rolled back, its
+        `WidgetsError` is raised and the transaction can't be committed. If
+        `chunk_size` is given, the transaction is committed after each
+        `chunk_size` added objects and at the end.
+
+        Other exceptions are not caught: they abort the batch and are
+        raised to the caller. The rows of the chunks committed before stay
+        added, and the errors of the rows seen so far are not returned.
+
+        Returns a list of ``(row index, WidgetsError)`` pairs.
+        """
+        # resolve a factory id once; views overriding `create` may have
+        # no factory
+        factory = getattr(self, '_factory', None)
+        if factory is not None:
+            self._factory = factory
+        errors = []
+        pending = 0
+        for index, data in enumerate(rows):
+            savepoint = transaction.savepoint(optimistic=True)
+            try:
+                if validate:
+                    data = self._validateData(data)
+                self.createAndAdd(data)
+            except WidgetsError, error:
+                try:
+                    savepoint.rollback()
+                except TypeError:
+                    # A data manager doesn't support savepoints, the
+                    # transaction can't be committed any more
+                    raise error
+                errors.append((index, error))
+                continue
+            pending += 1
+            if chunk_size and pending >= chunk_size:
+                transaction.commit()
+                pending = 0
+        if chunk_size and pending:
+            transaction.commit()
+        return errors
+
+    def _validateData(self, data):
+        # Does the conversion and validation of getWidgetsData for data
+        # not entered in widgets, returning the converted values
+        values, errors = convertData(self, data, required=True)
+        if errors:
+            names = [name for name in self.fieldNames if name in errors]
+            names.extend(sorted([name for name in errors
+                                 if name not in self.fieldNames]))
+            widget_errors = []
+            for name in names:
+                error = errors[name]
+                title = name
+                if name in self.schema:
+                    title = self.schema[name].title
+                if isinstance(error, RequiredMissing):
+                    error = MissingInputError(name, title,
+                                              'the field is required')
+                else:
+                    error = WidgetInputError(name, title, error)
+                widget_errors.append(error)
+            raise WidgetsError(widget_errors, widgetsData=values)
+        return values
+
     def add(self, content):
         return self.context.add(content)
 
     def nextURL(self):
         return self.context.nextURL()
 
+def _lookupFactory(factory_id, context):
+    # Looks up a factory utility with the lookup of the utility registry,
+    # which is cached until a registration changes in the site manager or
+    # its bases
+    sm = zope.component.getSiteManager(context)
+    registry = getattr(sm, 'utilities', None)
+    if registry is None:
+        return sm.getUtility(IFactory, factory_id)
+    factory = registry.lookup((), IFactory, factory_id)
+    if factory is None:
+        raise ComponentLookupError(IFactory, factory_id)
+    return factory
+
 # helper for factory resp. content_factory handling
 def _getFactory(self):
     # get factory or factory id
     factory = self.__dict__.get('_factory_or_id', self._factory_or_id)
 
     if type(factory) is str: # factory id
-        return zope.component.getUtility(IFactory, factory, self.context)
+        return _lookupFactory(factory, self.context)
     else:
         return factory
 
@@ -150,11 +391,10 @@ def _setFactory(self, value):
     self.__dict__['_factory_or_id'] = value
 
 
-def AddViewFactory(name, schema, label, permission, layer,
-                   template, default_template, bases, for_,
-                   fields, content_factory, arguments,
-                   keyword_arguments, set_before_add, set_after_add):
-
+def makeAddViewClass(name, schema, label, permission, template,
+                     default_template, bases, fields, content_factory,
+                     arguments, keyword_arguments, set_before_add,
+                     set_after_add, argument_plan=None):
     class_  = SimpleViewClass(
         template, used_for=schema, bases=bases, name=name)
 
@@ -163,12 +403,19 @@ def AddViewFactory(name, schema, label, permission, layer,
     class_.fieldNames = fields
     class_._factory_or_id = content_factory
     class_._factory = property(_getFactory, _setFactory)
-    class_._arguments = arguments
-    class_._keyword_arguments = keyword_arguments
-    class_._set_before_add = set_before_add
-    class_._set_after_add = set_after_add
-
-    class_.generated_form = ViewPageTemplateFile(default_template)
+    plan = argument_plan
+    if plan is None:
+        plan = ArgumentPlan(schema, arguments, keyword_arguments,
+                            set_before_add, set_after_add)
+    class_._argument_plan = plan
+    class_._arguments = plan.arguments
+    class_._keyword_arguments = plan.keyword_arguments
+    class_._set_before_add = plan.set_before_add
+    class_._set_after_add = plan.set_after_add
+
+    # share the compiled templates between all generated classes
+    class_.index = sharedTemplate(template)
+    class_.generated_form = sharedTemplate(default_template)
 
     defineChecker(class_,
                   NamesChecker(
@@ -177,8 +424,23 @@ def AddViewFactory(name, schema, label, permission, layer,
                     permission,
                     )
                   )
+    return class_
+
+def AddViewFactory(name, schema, label, permission, layer,
+                   template, default_template, bases, for_,
+                   fields, content_factory, arguments,
+                   keyword_arguments, set_before_add, set_after_add,
+                   argument_plan=None, deferred=False):
+    args = (name, schema, label, permission, template, default_template,
+            bases, fields, content_factory, arguments, keyword_arguments,
+            set_before_add, set_after_add, argument_plan)
+    if deferred:
+        factory = DeferredViewFactory(makeAddViewClass, *args)
+    else:
+        factory = makeAddViewClass(*args)
+
     if layer is None:
         layer = IDefaultBrowserLayer
     
     s = zope.component.getGlobalSiteManager()
-    s.registerAdapter(class_, (for_, layer), Interface, name)
+    s.registerAdapter(factory, (for_, layer), Interface, name)
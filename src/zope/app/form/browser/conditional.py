@@ -0,0 +1,139 @@
+##############################################################################
+#
+# Copyright (c) 2010 Zope Foundation and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""Conditional GET support for display and edit views
+
+A view with a true `conditional_get` attribute computes validators for
+its page from the modification stamp of its context, see
+`modificationStamp`, and answers GET requests whose ``If-None-Match`` or
+``If-Modified-Since`` header shows that the client's copy is current with
+status 304, without setting up widgets or rendering the page.
+
+The entity tag covers the stamp, the view, the request layers and
+locale, the principals of the interaction and the outcome of the checks
+of the permissions protecting the fields. ``If-Modified-Since`` is only
+used without ``If-None-Match`` and can't tell apart pages rendered for
+different principals or locales. The pages are marked private and as
+varying with the cookies and the authorization of the request, so shared
+caches don't keep them.
+
+The data of schemas the context doesn't provide is usually kept on
+other objects, such as annotations, whose changes the serial of the
+context doesn't show. For these schemas, an `IModificationStamp`
+adapter of the context is required.
+
+$Id$
+"""
+__docformat__ = 'restructuredtext'
+
+from hashlib import md5
+
+import zope.datetime
+from zope.interface import providedBy
+from zope.security.proxy import removeSecurityProxy
+
+from zope.app.form.browser.interfaces import IModificationStamp
+from zope.app.form.browser.displaycache import _permissionSignature
+from zope.app.form.browser.displaycache import _principals, _localeKey
+from zope.app.form.browser.flash import FLASH_COOKIE
+
+_z64 = '\0' * 8
+
+def modificationStamp(ob, use_serial=True):
+    """Returns the ``(stamp, modified)`` of `ob`, or ``None``.
+
+    An `IModificationStamp` adapter is used if there is one. Otherwise, if
+    `use_serial` is true, persistent objects are stamped with their serial and
+    modification time. Other objects, and persistent objects with unsaved
+    changes, have no stamp.
+    """
+    ob = removeSecurityProxy(ob)
+    adapter = IModificationStamp(ob, None)
+    if adapter is not None:
+        if adapter.stamp is None:
+            return None
+        return adapter.stamp, adapter.modified
+    if not use_serial:
+        return None
+    serial = getattr(ob, '_p_serial', None)
+    if not serial or serial == _z64 or getattr(ob, '_p_changed', False):
+        return None
+    return serial.encode('hex'), getattr(ob, '_p_mtime', None)
+
+def getValidators(view):
+    """Returns the ``(etag, modified)`` of the page of `view`, or ``None``.
+
+    There are no validators for requests other than plain GET and HEAD
+    requests, or for objects without a modification stamp.
+    """
+    request = view.request
+    if request.method not in ('GET', 'HEAD') or request.form:
+        return None
+    if FLASH_COOKIE in request.getCookies():
+        # the page shows a status message
+        return None
+    context = view.context
+    stamp = modificationStamp(context, view.schema.providedBy(context))
+    if stamp is None:
+        return None
+    signature = _permissionSignature(view, write=True)
+    if signature is None:
+        return None
+    key = (stamp[0], view.__class__.__name__,
+           getattr(view, '__name__', None), view.schema.__identifier__,
+           tuple(view.fieldNames),
+           tuple([iface.__identifier__ for iface in providedBy(request)]),
+           _localeKey(request), _principals(), signature)
+    etag = '"%s"' % md5(repr(key)).hexdigest()
+    return etag, stamp[1]
+
+def isNotModified(request, validators):
+    """Tells whether the client's copy of the page is current."""
+    if validators is None:
+        return False
+    etag, modified = validators
+    if_none_match = request.getHeader('If-None-Match')
+    if if_none_match is not None:
+        tags = [tag.strip() for tag in if_none_match.split(',')]
+        return '*' in tags or etag in tags or 'W/' + etag in tags
+    if_modified_since = request.getHeader('If-Modified-Since')
+    if if_modified_since is not None and modified is not None:
+        try:
+            since = zope.datetime.time(if_modified_since.split(';')[0])
+        except (zope.datetime.DateTimeError, ValueError):
+            return False
+        return int(modified) <= since
+    return False
+
+def answerConditional(view):
+    """Sets the validators of `view` on the response.
+
+    Returns true if the client's copy is current, after setting the status
+    to 304.
+    """
+    validators = view.validators
+    if validators is None:
+        return False
+    response = view.request.response
+    etag, modified = validators
+    # The page depends on the principal
+    response.setHeader('Cache-Control', 'private')
+    response.setHeader('Vary', 'Cookie, Authorization')
+    response.setHeader('ETag', etag)
+    if modified is not None:
+        response.setHeader('Last-Modified', zope.datetime.rfc1123_date(
+            modified))
+    if view.not_modified:
+        response.setStatus(304)
+        return True
+    return False
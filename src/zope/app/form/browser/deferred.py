@@ -0,0 +1,59 @@
+##############################################################################
+#
+# Copyright (c) 2010 Zope Foundation and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""Deferred generation of form view classes
+
+$Id$
+"""
+__docformat__ = 'restructuredtext'
+
+import threading
+
+
+class DeferredViewFactory(object):
+    """A view factory that generates its view class on first use.
+
+    `makeClass` is called with the remaining arguments to generate the
+    view class, including its checker. This happens once, when the first
+    view is created; all views are then instances of the same class.
+    """
+
+    def __init__(self, makeClass, *args, **kw):
+        self._makeClass = makeClass
+        self._args = args
+        self._kw = kw
+        self._class = None
+        self._lock = threading.Lock()
+
+    def viewClass(self):
+        """Returns the view class, generating it if needed."""
+        class_ = self._class
+        if class_ is None:
+            self._lock.acquire()
+            try:
+                class_ = self._class
+                if class_ is None:
+                    class_ = self._class = self._makeClass(
+                        *self._args, **self._kw)
+                    # the arguments are not needed anymore
+                    self._args = self._kw = None
+            finally:
+                self._lock.release()
+        return class_
+
+    def isGenerated(self):
+        """Tells whether the view class was generated already."""
+        return self._class is not None
+
+    def __call__(self, context, request):
+        return self.viewClass()(context, request)
@@ -0,0 +1,297 @@
+##############################################################################
+#
+# Copyright (c) 2010 Zope Foundation and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""Output cache for display views
+
+$Id$
+"""
+__docformat__ = 'restructuredtext'
+
+import time
+import threading
+import weakref
+
+from zope.interface import providedBy
+from zope.security.checker import Checker, CheckerPublic
+from zope.security.management import queryInteraction
+from zope.security.proxy import getChecker, removeSecurityProxy
+from zope.proxy import isProxy
+from zope.security.proxy import Proxy
+
+from zope.app.form.utility import _registerCleanUp
+
+# All caches, so that they can be invalidated by events
+_caches = weakref.WeakKeyDictionary()
+
+_PREV, _NEXT, _KEY, _VALUE = range(4)
+
+# The default number of seconds a page is cached
+DEFAULT_TTL = 300
+
+
+class DisplayCache(object):
+    """A thread-safe LRU cache for rendered display pages.
+
+    At most `size` pages are kept, each for at most `ttl` seconds; a `ttl`
+    of ``None`` keeps pages until they are dropped. Entries are stored for
+    an object identity, see `objectIdentity`, so that all pages of an
+    object can be dropped with `invalidate`.
+
+    `hits` and `misses` count the outcome of `query`.
+    """
+
+    def __init__(self, size=1000, ttl=DEFAULT_TTL):
+        self.size = size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._clear()
+        _caches[self] = True
+
+    def _clear(self):
+        self._data = {}
+        self._identities = {}
+        # the least recently used entry follows the root
+        self._root = root = []
+        root[:] = [root, root, None, None]
+
+    def _unlink(self, link):
+        link[_PREV][_NEXT] = link[_NEXT]
+        link[_NEXT][_PREV] = link[_PREV]
+
+    def _remove(self, link):
+        self._unlink(link)
+        key = link[_KEY]
+        del self._data[key]
+        keys = self._identities.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._identities[key[0]]
+
+    def query(self, key, default=None):
+        """Returns the value stored for `key` or `default`."""
+        self._lock.acquire()
+        try:
+            link = self._data.get(key)
+            if link is not None:
+                value, expires, ref = link[_VALUE]
+                if ((expires is not None and expires < time.time())
+                    or (ref is not None and ref() is None)):
+                    self._remove(link)
+                    link = None
+            if link is None:
+                self.misses += 1
+                return default
+            # move to the most recently used end
+            root = self._root
+            self._unlink(link)
+            last = root[_PREV]
+            link[_PREV], link[_NEXT] = last, root
+            last[_NEXT] = root[_PREV] = link
+            self.hits += 1
+            return value
+        finally:
+            self._lock.release()
+
+    def set(self, key, value, ob=None):
+        """Stores `value` for `key`.
+
+        The first item of `key` must be the identity of the object the
+        value was computed for. If `ob` is given, the entry expires when
+        the object is garbage collected.
+        """
+        ref = None
+        if ob is not None:
+            ref = weakref.ref(ob)
+        expires = None
+        if self.ttl is not None:
+            expires = time.time() + self.ttl
+        self._lock.acquire()
+        try:
+            link = self._data.get(key)
+            if link is not None:
+                self._remove(link)
+            root = self._root
+            last = root[_PREV]
+            link = [last, root, key, (value, expires, ref)]
+            last[_NEXT] = root[_PREV] = link
+            self._data[key] = link
+            self._identities.setdefault(key[0], set()).add(key)
+            while len(self._data) > self.size:
+                self._remove(root[_NEXT])
+        finally:
+            self._lock.release()
+
+    def invalidate(self, ob):
+        """Drops all entries stored for `ob`."""
+        identity = objectIdentity(ob)
+        if identity is None:
+            return
+        self._lock.acquire()
+        try:
+            for key in list(self._identities.get(identity, ())):
+                self._remove(self._data[key])
+        finally:
+            self._lock.release()
+
+    def clear(self):
+        """Drops all entries and resets the counters."""
+        self._lock.acquire()
+        try:
+            self._clear()
+            self.hits = self.misses = 0
+        finally:
+            self._lock.release()
+
+    def __len__(self):
+        return len(self._data)
+
+    def statistics(self):
+        """Returns a mapping with the size, hits and misses of the cache."""
+        return {'size': len(self._data), 'maxsize': self.size,
+                'ttl': self.ttl, 'hits': self.hits, 'misses': self.misses}
+
+
+def objectIdentity(ob):
+    """Returns a hashable identity for `ob`, or ``None``.
+
+    Persistent objects are identified by their oid; other objects by their
+    id, which is only meaningful while they are alive. Objects that can't
+    be weakly referenced have no identity.
+    """
+    ob = removeSecurityProxy(ob)
+    oid = getattr(ob, '_p_oid', None)
+    if oid is not None:
+        return ('oid', oid)
+    try:
+        weakref.ref(ob)
+    except TypeError:
+        return None
+    return ('id', id(ob))
+
+
+def _permissionSignature(view, write=False):
+    # The outcome of the permission checks protecting the displayed fields,
+    # and the changes of the fields if `write` is true
+    context = view.context
+    if not isProxy(context, Proxy):
+        return ()
+    checker = getChecker(context)
+    interaction = queryInteraction()
+    if type(checker) is not Checker or interaction is None:
+        return None
+    ob = removeSecurityProxy(context)
+    permissions = {}
+    for name in view.fieldNames:
+        names = [checker.permission_id(name)]
+        if write:
+            names.append(checker.setattr_permission_id(name))
+        for permission in names:
+            if permission is None or permission is CheckerPublic:
+                continue
+            if permission not in permissions:
+                permissions[permission] = bool(
+                    interaction.checkPermission(permission, ob))
+    permissions = permissions.items()
+    permissions.sort()
+    return tuple(permissions)
+
+
+def displayCacheKey(view):
+    """Returns the key to cache the output of a display `view`, or ``None``.
+
+    The key consists of the identity of the displayed object, its serial
+    if it is persistent, the view class, schema and field names, the
+    request URL (which includes the virtual host root), layers and locale,
+    the principals of the interaction, and the outcome of the checks of
+    the permissions protecting the fields.
+
+    Output is not cached if the request has form data or the object has
+    unsaved changes. Only the output of views of schemas the object
+    provides is cached: the data of other schemas is usually kept on
+    other objects, such as annotations, whose changes the key can't show.
+    """
+    request = view.request
+    if request.form or request.method not in ('GET', 'HEAD'):
+        return None
+    ob = removeSecurityProxy(view.context)
+    if not view.schema.providedBy(ob):
+        return None
+    identity = objectIdentity(ob)
+    if identity is None or getattr(ob, '_p_changed', False):
+        return None
+    signature = _permissionSignature(view)
+    if signature is None:
+        return None
+    return (identity, getattr(ob, '_p_serial', None),
+            view.__class__, view.schema, tuple(view.fieldNames),
+            str(request.URL), tuple(providedBy(request)), _localeKey(request),
+            _principals(), signature)
+
+
+def _principals():
+    # The ids of the principals of the interaction
+    interaction = queryInteraction()
+    if interaction is None:
+        return ()
+    return tuple([participation.principal.id
+                  for participation in interaction.participations
+                  if participation.principal is not None])
+
+
+def _localeKey(request):
+    locale = getattr(request, 'locale', None)
+    if locale is None:
+        return None
+    return locale.id.language, locale.id.territory, locale.id.variant
+
+
+def renderCached(view, cache, render):
+    """Returns the output of `view`, from `cache` if possible.
+
+    `render` is called to produce the output on a cache miss. Only
+    successful responses are stored.
+    """
+    key = displayCacheKey(view)
+    if key is None:
+        return render()
+    response = view.request.response
+    cached = cache.query(key)
+    if cached is not None:
+        body, content_type = cached
+        if content_type and not response.getHeader('Content-Type'):
+            response.setHeader('Content-Type', content_type)
+        return body
+    body = render()
+    # 599 means that the status has not been set yet
+    if response.getStatus() in (200, 599):
+        ob = removeSecurityProxy(view.context)
+        if key[0][0] == 'oid':
+            ob = None
+        cache.set(key, (body, response.getHeader('Content-Type')), ob)
+    return body
+
+
+def invalidateDisplayCaches(event):
+    """Drops the cached pages of a modified object from all caches."""
+    for cache in list(_caches.keys()):
+        cache.invalidate(event.object)
+
+
+def _clearDisplayCaches():
+    for cache in list(_caches.keys()):
+        cache.clear()
+
+_registerCleanUp(_clearDisplayCaches)
@@ -23,19 +23,34 @@ import transaction
 import zope.component
 from zope.interface import Interface
 from zope.schema import getFieldNamesInOrder
+from zope.schema.interfaces import ValidationError
+from zope.publisher.interfaces import NotFound
 from zope.publisher.interfaces.browser import IDefaultBrowserLayer
 from zope.publisher.browser import BrowserView
 from zope.security.checker import defineChecker, NamesChecker
 from zope.event import notify
+from zope.i18n import translate
 from zope.lifecycleevent import ObjectModifiedEvent
 from zope.lifecycleevent import Attributes
 
 from zope.browserpage import ViewPageTemplateFile
 from zope.browserpage.simpleviewclass import SimpleViewClass
 from zope.formlib.interfaces import WidgetsError
-from zope.app.form.utility import setUpEditWidgets, applyWidgetsChanges
+from zope.app.form.utility import setUpEditWidgets
+from zope.app.form.utility import applyWidgetsChangedFields
+from zope.app.form.utility import setUpLazyWidgets, getUnwritableFields
 from zope.app.form.browser.i18n import _
-from zope.app.form.browser.submit import Update
+from zope.app.form.browser.submit import Update, UpdateField
+from zope.app.form.browser.template import sharedTemplate
+from zope.app.form.browser.deferred import DeferredViewFactory
+from zope.app.form.browser.timing import timed, timedFields
+from zope.app.form.browser.headless import isJSONRequest, readJSONData
+from zope.app.form.browser.headless import convertJSONData, errorMessage
+from zope.app.form.browser.headless import renderJSON
+from zope.app.form.browser.rules import getValidationRules, RULES_NAME
+from zope.app.form.browser.flash import flash, takeFlash
+from zope.app.form.browser.conditional import getValidators, isNotModified
+from zope.app.form.browser.conditional import answerConditional
 
 class EditView(BrowserView):
     """Simple edit-view base class
@@ -46,25 +61,128 @@ class EditView(BrowserView):
     The automatically generated widgets are available by name through
     the attributes `*_widget`.
     (E.g. ``view.title_widget for the title widget``)
+
+    If `lazy_widgets` is true, each widget is only set up when its
+    attribute is first accessed.
+
+    After a successful update, all widgets are refreshed. Set
+    `incremental_refresh` to true to refresh only the widgets of the fields
+    that were changed, if setting a field, or the events sent for it, never
+    changes other fields.
+
+    The `ObjectModifiedEvent` sent after an update describes the fields
+    that were changed. Set `describe_all_fields` to true to describe all
+    form fields instead.
+
+    The time taken by the phases of the view is reported to the collector
+    of `zope.app.form.browser.timing`, if one is set.
+
+    If `accept_json` is true, POST requests with a JSON body are handled
+    without widgets and answered with JSON, see
+    `zope.app.form.browser.headless`.
+
+    If `inline_edit` is true, a POST request submitting the form with an
+    ``UPDATE_FIELD`` variable naming one of the form fields updates that
+    field only: only its widget is set up, checked and validated, the
+    `ObjectModifiedEvent` describes it alone, and the response is the
+    refreshed widget, or its error with status 400.
+
+    If `publish_validation_rules` is true, the validation rules of the
+    form fields are published as JSON under the name
+    ``validation-rules.json``, see `zope.app.form.browser.rules`.
+
+    If `redirect_after_post` is true, a successful update redirects back
+    to the form with status 303 instead of refreshing the widgets and
+    rendering the page. The status message is shown by the following GET,
+    see `zope.app.form.browser.flash`.
+
+    If `conditional_get` is true, GET requests for a page the client has
+    are answered with status 304 without setting up widgets, see
+    `zope.app.form.browser.conditional`.
     """
 
     errors = ()
     update_status = None
     label = ''
+    lazy_widgets = False
+    incremental_refresh = False
+    describe_all_fields = False
+    accept_json = False
+    json_request = False
+    json_result = None
+    inline_edit = False
+    inline_field = None
+    publish_validation_rules = False
+    redirect_after_post = False
+    redirected = False
+    conditional_get = False
+    not_modified = False
+    validators = None
+    _ignoreStickyValues = False
+
+    def _getFieldNames(self):
+        # Fall-back field names computes from schema
+        names = self.__dict__.get('_fieldNames')
+        if names is None:
+            names = getFieldNamesInOrder(self.schema)
+        return names
 
-    # Fall-back field names computes from schema
-    fieldNames = property(lambda self: getFieldNamesInOrder(self.schema))
+    def _setFieldNames(self, names):
+        # Set for inline updates
+        self.__dict__['_fieldNames'] = names
+
+    fieldNames = property(_getFieldNames, _setFieldNames)
     # Fall-back template
     generated_form = ViewPageTemplateFile('edit.pt')
 
     def __init__(self, context, request):
         super(EditView, self).__init__(context, request)
-        self._setUpWidgets()
+        if self.accept_json and isJSONRequest(request):
+            self.json_request = True
+            self._setUpJSON()
+        else:
+            if self.conditional_get:
+                self.validators = getValidators(self)
+                self.not_modified = isNotModified(request, self.validators)
+                if self.not_modified:
+                    # The page is not rendered, widgets are only set up
+                    # if they are used.
+                    self._setUpLazyWidgets()
+                    return
+            if self.inline_edit:
+                self._setUpInline()
+            if self.lazy_widgets:
+                self._setUpLazyWidgets()
+            else:
+                self._setUpWidgets()
 
     def _setUpWidgets(self):
         self.adapted = self.schema(self.context)
-        setUpEditWidgets(self, self.schema, source=self.adapted,
-                         names=self.fieldNames)
+        timedFields(self, 'setup', setUpEditWidgets, self.fieldNames,
+                    self, self.schema, source=self.adapted)
+
+    def _setUpLazyWidgets(self):
+        self.adapted = self.schema(self.context)
+        setUpLazyWidgets(self, self.fieldNames)
+
+    def _setUpJSON(self):
+        self.adapted = self.schema(self.context)
+
+    def _setUpInline(self):
+        # Restricts the view to the single field named by the request
+        request = self.request
+        if request.method != 'POST' or Update not in request:
+            return
+        name = request.form.get(UpdateField)
+        if name and name in self.fieldNames:
+            self.inline_field = name
+            self.fieldNames = [name]
+
+    def _setUpWidget(self, name):
+        # Called by the lazy widgets to set up a single widget
+        timedFields(self, 'setup', setUpEditWidgets, [name],
+                    self, self.schema, source=self.adapted,
+                    ignoreStickyValues=self._ignoreStickyValues)
 
     def setPrefix(self, prefix):
         for widget in self.widgets():
@@ -74,59 +192,196 @@ class EditView(BrowserView):
         return [getattr(self, name+'_widget')
                 for name in self.fieldNames]
 
+    def validationRules(self):
+        """Returns the validation rules of the form fields."""
+        return getValidationRules(self.schema, self.fieldNames)
+
+    def _renderValidationRules(self):
+        return renderJSON(self, {'fields': self.validationRules()})
+
+    def publishTraverse(self, request, name):
+        if name == RULES_NAME and self.publish_validation_rules:
+            return self._renderValidationRules
+        traverse = getattr(super(EditView, self), 'publishTraverse', None)
+        if traverse is None:
+            raise NotFound(self, name, request)
+        return traverse(request, name)
+
     def changed(self):
         # This method is overridden to execute logic *after* changes
         # have been made.
         pass
 
+    def _refreshNames(self, changed):
+        """Returns the names of the widgets to refresh after an update.
+
+        `changed` are the names of the fields that were changed.
+        """
+        if self.incremental_refresh:
+            names = changed
+        else:
+            names = self.fieldNames
+        if self.lazy_widgets:
+            # Widgets set up from now on show the new values
+            self._ignoreStickyValues = True
+            names = [name for name in names
+                     if name + '_widget' in self.__dict__]
+        return names
+
     def update(self):
         if self.update_status is not None:
             # We've been called before. Just return the status we previously
             # computed.
             return self.update_status
 
+        if self.not_modified:
+            # A conditional GET has nothing to update
+            self.update_status = ''
+            return ''
+
         status = ''
 
         content = self.adapted
 
+        if self.json_request:
+            return self._updateJSON()
+
         if Update in self.request:
             changed = False
             try:
-                changed = applyWidgetsChanges(self, self.schema,
-                    target=content, names=self.fieldNames)
-                # We should not generate events when an adapter is used.
-                # That's the adapter's job.
-                if changed and self.context is self.adapted:
-                    description = Attributes(self.schema, *self.fieldNames)
-                    notify(ObjectModifiedEvent(content, description))
+                changed = timedFields(self, 'apply', applyWidgetsChangedFields,
+                                      self.fieldNames, self, self.schema,
+                                      target=content)
+                self._notifyModified(changed)
             except WidgetsError, errors:
                 self.errors = errors
                 status = _("An error occurred.")
                 transaction.doom()
             else:
-                setUpEditWidgets(self, self.schema, source=self.adapted,
-                                 ignoreStickyValues=True, 
-                                 names=self.fieldNames)
+                redirect = self._redirectsAfterPost()
+                if not redirect:
+                    names = self._refreshNames(changed)
+                    if names:
+                        timedFields(self, 'refresh', setUpEditWidgets, names,
+                                    self, self.schema, source=self.adapted,
+                                    ignoreStickyValues=True)
                 if changed:
                     self.changed()
-                    formatter = self.request.locale.dates.getFormatter(
-                        'dateTime', 'medium')
-                    status = _("Updated on ${date_time}",
-                               mapping={'date_time':
-                                        formatter.format(datetime.utcnow())})
+                    status = self._updatedStatus()
+                if redirect:
+                    self._redirectAfterPost(status)
+        elif self.redirect_after_post:
+            status = takeFlash(self.request) or ''
 
         self.update_status = status
         return status
 
+    def _notifyModified(self, changed):
+        # We should not generate events when an adapter is used.
+        # That's the adapter's job.
+        if changed and self.context is self.adapted:
+            if self.describe_all_fields:
+                description = Attributes(self.schema, *self.fieldNames)
+            else:
+                description = Attributes(self.schema, *changed)
+            timed(self, 'events', notify,
+                  ObjectModifiedEvent(self.adapted, description))
 
-def EditViewFactory(name, schema, label, permission, layer,
-                    template, default_template, bases, for_, fields,
-                    fulledit_path=None, fulledit_label=None):
+    def _redirectsAfterPost(self):
+        # Inline updates are answered with the widget
+        return self.redirect_after_post and self.inline_field is None
+
+    def _redirectAfterPost(self, status):
+        if status:
+            flash(self.request, status)
+        self.request.response.redirect(self.request.URL, status=303)
+        self.redirected = True
+
+    def _updatedStatus(self):
+        formatter = self.request.locale.dates.getFormatter(
+            'dateTime', 'medium')
+        return _("Updated on ${date_time}",
+                 mapping={'date_time': formatter.format(datetime.utcnow())})
 
+    def _updateJSON(self):
+        # Applies the posted JSON object like widget input would be
+        try:
+            values, errors = convertJSONData(
+                self, readJSONData(self.request))
+        except ValueError, error:
+            errors = {'': errorMessage(error, self.request)}
+        changed = []
+        content = self.adapted
+        if not errors:
+            # Check all fields before changing any of them
+            for name in getUnwritableFields(content, self.schema,
+                                            self.fieldNames):
+                if name in values:
+                    errors[name] = translate(
+                        _("You are not allowed to change the field"),
+                        context=self.request)
+        if not errors:
+            for name in self.fieldNames:
+                if name in values:
+                    field = self.schema[name].bind(content)
+                    value = values[name]
+                    if field.query(content, self) != value:
+                        try:
+                            field.set(content, value)
+                        except ValidationError, error:
+                            errors[name] = errorMessage(error, self.request)
+                        else:
+                            changed.append(name)
+        if errors:
+            transaction.doom()
+            self.update_status = _("An error occurred.")
+            self.json_result = {'status': 'error', 'errors': errors}
+        else:
+            self._notifyModified(changed)
+            status = ''
+            if changed:
+                self.changed()
+                status = self._updatedStatus()
+            self.update_status = status
+            self.json_result = {'status': 'ok', 'errors': {},
+                                'changed': changed}
+        return self.update_status
+
+    def __call__(self, *args, **kw):
+        if self.json_request:
+            self.update()
+            return renderJSON(self, self.json_result)
+        if answerConditional(self):
+            return u''
+        if self.inline_field is not None:
+            self.update()
+            return timed(self, 'render', self._renderInline)
+        if self.redirect_after_post and Update in self.request:
+            self.update()
+            if self.redirected:
+                return u''
+        # The template is rendered by a base class of the generated views
+        return timed(self, 'render', super(EditView, self).__call__,
+                     *args, **kw)
+
+    def _renderInline(self):
+        widget = getattr(self, self.inline_field + '_widget')
+        if self.errors:
+            self.request.response.setStatus(400)
+            return widget.error()
+        return widget()
+
+
+def makeEditViewClass(name, schema, label, permission, template,
+                      default_template, bases, fields,
+                      fulledit_path=None, fulledit_label=None,
+                      redirect_after_post=False, conditional_get=False):
     class_ = SimpleViewClass(template, used_for=schema, bases=bases, name=name)
     class_.schema = schema
     class_.label = label
     class_.fieldNames = fields
+    class_.redirect_after_post = redirect_after_post
+    class_.conditional_get = conditional_get
 
     class_.fulledit_path = fulledit_path
     if fulledit_path and (fulledit_label is None):
@@ -134,14 +389,31 @@ def EditViewFactory(name, schema, label, permission, layer,
 
     class_.fulledit_label = fulledit_label
 
-    class_.generated_form = ViewPageTemplateFile(default_template)
+    # share the compiled templates between all generated classes
+    class_.index = sharedTemplate(template)
+    class_.generated_form = sharedTemplate(default_template)
 
     defineChecker(class_,
                   NamesChecker(("__call__", "__getitem__",
                                 "browserDefault", "publishTraverse"),
                                permission))
+    return class_
+
+
+def EditViewFactory(name, schema, label, permission, layer,
+                    template, default_template, bases, for_, fields,
+                    fulledit_path=None, fulledit_label=None, deferred=False,
+                    redirect_after_post=False, conditional_get=False):
+    args = (name, schema, label, permission, template, default_template,
+            bases, fields, fulledit_path, fulledit_label, redirect_after_post,
+            conditional_get)
+    if deferred:
+        factory = DeferredViewFactory(makeEditViewClass, *args)
+    else:
+        factory = makeEditViewClass(*args)
+
     if layer is None:
         layer = IDefaultBrowserLayer
 
     s = zope.component.getGlobalSiteManager()
-    s.registerAdapter(class_, (for_, layer), Interface, name)
+    s.registerAdapter(factory, (for_, layer), Interface, name)
@@ -0,0 +1,49 @@
+##############################################################################
+#
+# Copyright (c) 2010 Zope Foundation and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""Status messages carried over a redirect
+
+A form redirecting after a POST keeps its status message in a cookie
+for the page it redirects to. The cookie is limited to the path of the
+form and expired when the message is taken.
+
+$Id$
+"""
+__docformat__ = 'restructuredtext'
+
+from urllib import quote, unquote
+from urlparse import urlsplit
+
+from zope.i18n import translate
+
+FLASH_COOKIE = 'zope.app.form.status'
+
+def _path(request):
+    return urlsplit(str(request.URL))[2] or '/'
+
+def flash(request, message):
+    """Keeps the translated `message` for the next request to the form."""
+    text = translate(message, context=request)
+    request.response.setCookie(FLASH_COOKIE, quote(text.encode('utf-8')),
+                               path=_path(request))
+
+def takeFlash(request):
+    """Returns the message kept with `flash` and forgets it.
+
+    Returns ``None`` if there is no message.
+    """
+    value = request.getCookies().get(FLASH_COOKIE)
+    if not value:
+        return None
+    request.response.expireCookie(FLASH_COOKIE, path=_path(request))
+    return unquote(value).decode('utf-8')
@@ -21,23 +21,90 @@ import transaction
 
 from zope.formlib.interfaces import WidgetsError, IInputWidget
 
-from zope.app.form.utility import setUpWidgets, applyWidgetsChanges
+from zope.app.form.utility import setUpWidgets
+from zope.app.form.utility import applyWidgetsChangedFields
+from zope.app.form.utility import setUpLazyWidgets, getFieldPlan
+from zope.app.form.utility import no_value, _widgetHasStickyValue
 from zope.app.form.browser.editview import EditView
 from zope.app.form.browser.i18n import _
+from zope.app.form.browser.timing import timed, timedFields
 from zope.app.form.browser.submit import Update
+from zope.app.form.browser.flash import takeFlash
 
 
 class Data(dict):
-    """Dictionary wrapper to make keys available as attributes."""
+    """Dictionary wrapper to make keys available as attributes.
+
+    If a `load` function is given, missing values are looked up with it
+    when first needed. It is called with a key and raises `KeyError` if
+    there is no value. Values that were not loaded yet are not items:
+    ``key in data``, iteration and `len` only see the values set or loaded
+    so far, while ``data[key]``, `get` and attribute access load the
+    value. The `load` function is not pickled or compared.
+    """
+
+    __slots__ = ('_load',)
+
+    def __init__(self, *args, **kw):
+        object.__setattr__(self, '_load', kw.pop('load', None))
+        dict.__init__(self, *args, **kw)
+
+    def __missing__(self, key):
+        if self._load is None:
+            raise KeyError(key)
+        value = self[key] = self._load(key)
+        return value
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def copy(self, names=None):
+        """Returns a copy, with the same `load` function.
+
+        If `names` is given, only the values of these keys are copied.
+        """
+        if names is None:
+            return self.__class__(self, load=self._load)
+        return self.__class__([(key, dict.__getitem__(self, key))
+                               for key in names if key in self],
+                              load=self._load)
+
+    def __reduce__(self):
+        return self.__class__, (dict(self),)
 
     def __getattr__(self, name):
-        return self[name]
+        if name.startswith('__'):
+            raise AttributeError(name)
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name)
 
     def __setattr__(self, name, value):
         self[name] = value
 
+    def __delattr__(self, name):
+        try:
+            del self[name]
+        except KeyError:
+            raise AttributeError(name)
+
 
 class FormView(EditView):
+    """Edit view for data that is not stored on the context.
+
+    The values of the fields are loaded lazily, one field at a time with
+    `getFieldData`, when a widget shows the value or when the input of a
+    widget is applied. They are kept in `data`, see `Data`.
+
+    After an update, `setChangedData` is called with the changed values.
+    By default it loads the other values and passes all of them to
+    `setData`; forms that can save the changed values only override
+    `setChangedData` instead.
+    """
 
     def getData(self):
         """Get the data for the form.
@@ -49,17 +116,75 @@ class FormView(EditView):
     def setData(self, data):
         """Set the data gotten from a form.
 
-        The data will be a dictionary of fieldnames to values.
+        The data will be a `Data` mapping of the field names to values.
 
         May return a status message.
         """
         NotImplemented, 'Must be implemented by a specific form class'
-    
+
+    def setChangedData(self, data):
+        """Set the changed data gotten from a form.
+
+        The data will be a `Data` mapping of the names of the changed
+        fields to their values. The values of the other fields are loaded
+        when they are looked up, but are not items until then: use
+        ``key in data`` or `keys` to find the changed fields, and
+        ``data[key]`` or `get` to read any value.
+
+        The default implementation adds the stored values of the other
+        fields, see `getFieldData`, to `data`, passes the result to
+        `setData` and returns its result. May return a status message.
+        """
+        data = Data(data, load=self.getFieldData)
+        for name in getFieldPlan(self.schema, self.fieldNames).names:
+            data.get(name)
+        # the other keys of `getData` are passed, too
+        all = self.__dict__.get('_allData')
+        if all is not None:
+            for key in all.keys():
+                if key not in data:
+                    data[key] = all[key]
+        return self.setData(data)
+
+    def getFieldData(self, name):
+        """Get the value of the field `name` for the form.
+
+        Raises `KeyError` if there is no value. Override this method to
+        load only the values that are needed; the default implementation
+        calls `getData` once and looks the value up in the result.
+        """
+        data = self.__dict__.get('_allData')
+        if data is None:
+            data = self._allData = self.getData()
+        return data[name]
+
+    def _newData(self):
+        return Data(load=self.getFieldData)
+
     def _setUpWidgets(self):
-        self.data = Data(self.getData())
-        setUpWidgets(
-            self, self.schema, IInputWidget, initial=self.data, 
-            names=self.fieldNames)
+        self.data = self._newData()
+        timedFields(self, 'setup', self._setUpDataWidgets, self.fieldNames)
+
+    def _setUpLazyWidgets(self):
+        self.data = self._newData()
+        setUpLazyWidgets(self, self.fieldNames)
+
+    def _setUpWidget(self, name):
+        timedFields(self, 'setup', self._setUpDataWidgets, [name],
+                    ignoreStickyValues=self._ignoreStickyValues)
+
+    def _setUpDataWidgets(self, names, ignoreStickyValues=False):
+        # Sets up the widgets of `names`, loading the values of those
+        # that show them
+        setUpWidgets(self, self.schema, IInputWidget, names=names,
+                     ignoreStickyValues=ignoreStickyValues)
+        data = self.data
+        for name in names:
+            widget = getattr(self, name + '_widget')
+            if ignoreStickyValues or not _widgetHasStickyValue(widget):
+                value = data.get(name, no_value)
+                if value is not no_value:
+                    widget.setRenderedValue(value)
 
     def update(self):
         if self.update_status is not None:
@@ -67,22 +192,35 @@ class FormView(EditView):
             # computed.
             return self.update_status
 
+        if self.not_modified:
+            # A conditional GET has nothing to update
+            self.update_status = ''
+            return ''
+
         status = ''
 
         if Update in self.request:
             try:
-                changed = applyWidgetsChanges(
-                    self, self.schema, target=self.data, names=self.fieldNames)
+                changed = timedFields(self, 'apply', applyWidgetsChangedFields,
+                                      self.fieldNames, self, self.schema,
+                                      target=self.data)
             except WidgetsError, errors:
                 self.errors = errors
                 status = _("An error occurred.")
                 transaction.doom()
             else:
                 if changed:
-                    status = self.setData(self.data)
-                setUpWidgets(
-                    self, self.schema, IInputWidget, initial=self.data,
-                    ignoreStickyValues=True, names=self.fieldNames)
+                    status = timed(self, 'save', self.setChangedData,
+                                   self.data.copy(changed))
+                if self._redirectsAfterPost():
+                    self._redirectAfterPost(status)
+                else:
+                    names = self._refreshNames(changed)
+                    if names:
+                        timedFields(self, 'refresh', self._setUpDataWidgets,
+                                    names, ignoreStickyValues=True)
+        elif self.redirect_after_post:
+            status = takeFlash(self.request) or ''
 
         self.update_status = status
         return status
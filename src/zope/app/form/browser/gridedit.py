@@ -0,0 +1,314 @@
+##############################################################################
+#
+# Copyright (c) 2010 Zope Foundation and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""Grid edit view, editing many objects in one form
+
+$Id$
+"""
+__docformat__ = 'restructuredtext'
+
+from itertools import islice
+import transaction
+
+import zope.component
+from zope.event import notify
+from zope.interface import Interface
+from zope.lifecycleevent import ObjectModifiedEvent, Attributes
+from zope.publisher.browser import BrowserView
+from zope.publisher.interfaces.browser import IDefaultBrowserLayer
+from zope.schema import getFieldNamesInOrder
+from zope.security.checker import defineChecker, NamesChecker
+from zope.security.interfaces import ForbiddenAttribute
+from zope.security.proxy import Proxy, getChecker, removeSecurityProxy
+from zope.proxy import isProxy
+
+from zope.browserpage import ViewPageTemplateFile
+from zope.formlib.interfaces import WidgetsError, InputErrors
+from zope.formlib.interfaces import IInputWidget, IDisplayWidget
+from zope.app.form.utility import setUpWidget, no_value
+from zope.app.form.utility import getFieldPlan, getUnwritableFields
+from zope.app.form.utility import applyWidgetsChangedFields
+from zope.app.form.browser.i18n import _
+from zope.app.form.browser.submit import Update
+from zope.app.form.browser.deferred import DeferredViewFactory
+from zope.app.form.browser.template import sharedTemplate
+
+
+class GridRow(object):
+    """A row of a grid edit view, editing one object.
+
+    The widgets of the row are available as ``<name>_widget`` attributes,
+    as on an edit view. Custom widget factories are taken from the grid
+    view. Fields the view decides may not be changed, see
+    `GridEditView.unwritableFields`, get display widgets.
+    """
+
+    errors = ()
+
+    def __init__(self, view, key, context):
+        self.view = view
+        self.request = view.request
+        self.key = key
+        self.context = context
+        self.prefix = 'row.' + unicode(key).encode('utf-8').encode('hex')
+        self.adapted = view.schema(context)
+        self._setUpWidgets(view.fieldNames)
+
+    def _setUpWidgets(self, names, ignoreStickyValues=False):
+        view = self.view
+        adapted = self.adapted
+        unwritable = view.unwritableFields(adapted)
+        for name, field in getFieldPlan(view.schema, names):
+            try:
+                value = field.get(adapted)
+            except ForbiddenAttribute:
+                raise
+            except AttributeError:
+                value = no_value
+            if name in unwritable:
+                viewType = IDisplayWidget
+            else:
+                viewType = IInputWidget
+            setUpWidget(self, name, field, viewType, value=value,
+                        prefix=self.prefix,
+                        ignoreStickyValues=ignoreStickyValues,
+                        context=self.context)
+
+    def __getattr__(self, name):
+        # custom widget factories of the view
+        if name.endswith('_widget'):
+            return getattr(self.view, name)
+        raise AttributeError(name)
+
+    def widgets(self):
+        return [getattr(self, name+'_widget')
+                for name in self.view.fieldNames]
+
+    def validate(self):
+        """Checks the input of the row without applying it.
+
+        Returns the input errors, which are also the row's `errors`.
+        """
+        errors = []
+        for widget in self.widgets():
+            if IInputWidget.providedBy(widget) and widget.hasInput():
+                try:
+                    widget.getInputValue()
+                except InputErrors, error:
+                    errors.append(error)
+        self.errors = errors
+        return errors
+
+    def update(self):
+        """Applies the input of the row and returns the changed fields.
+
+        The row's `errors` are set if the input is invalid.
+        """
+        view = self.view
+        try:
+            changed = applyWidgetsChangedFields(
+                self, view.schema, target=self.adapted, names=view.fieldNames)
+        except WidgetsError, errors:
+            self.errors = errors
+            return []
+        if changed:
+            # We should not generate events when an adapter is used.
+            # That's the adapter's job.
+            if self.context is self.adapted:
+                description = Attributes(view.schema, *changed)
+                notify(ObjectModifiedEvent(self.adapted, description))
+            self._setUpWidgets(changed, ignoreStickyValues=True)
+        return changed
+
+
+class GridEditView(BrowserView):
+    """Edit view for a batch of objects, one per row.
+
+    Subclasses should provide a `schema` attribute defining the schema
+    of the objects to be edited. The objects are the items of the
+    context, see `items`, shown in batches of `batch_size`. The request
+    variable ``batch_start`` selects the batch. The ``grideditform``
+    directive generates and registers grid edit views.
+
+    The view is not an `EditView`, whose widgets and adapted object
+    belong to a single context. Each row, see `GridRow`, edits its object
+    like an edit view: the widgets use the key of the object as prefix,
+    and changes are applied with `applyWidgetsChangedFields` and described
+    by an `ObjectModifiedEvent`. All rows share the field plan of the
+    view, and which fields may be changed is decided once per class of
+    the edited objects; each change is still checked by the security
+    proxy of its object. Unless rows were submitted, each row is set up,
+    rendered and dropped in turn, see `renderRows`. The rendered rows are
+    kept until the page is returned.
+
+    The input of all rows of the batch is checked before any row is
+    changed; if any row has errors, nothing is applied. The changes of all
+    rows are applied in one transaction, which is doomed if errors occur.
+    """
+
+    errors = ()
+    update_status = None
+    label = ''
+    batch_size = 20
+
+    # Fall-back field names computes from schema
+    fieldNames = property(lambda self: getFieldNamesInOrder(self.schema))
+
+    template = ViewPageTemplateFile('gridedit.pt')
+
+    def items(self):
+        """Returns an iterable of the ``(key, object)`` pairs to edit."""
+        return self.context.items()
+
+    def count(self):
+        """Returns the number of objects to edit."""
+        return len(self.context)
+
+    def batchStart(self):
+        try:
+            start = int(self.request.get('batch_start', 0))
+        except ValueError:
+            start = 0
+        return max(start, 0)
+
+    def _batch(self):
+        start = self.batchStart()
+        for key, ob in islice(self.items(), start, start + self.batch_size):
+            yield GridRow(self, key, ob)
+
+    def rows(self):
+        """Returns the rows of the current batch.
+
+        Unless the rows were updated, they are set up one by one as they
+        are iterated.
+        """
+        rows = self.__dict__.get('_rows')
+        if rows is None:
+            return self._batch()
+        return rows
+
+    def unwritableFields(self, ob):
+        """Returns the names of the fields that may not be changed on `ob`.
+
+        The names are computed with `getUnwritableFields` for the first
+        object of each class and checker, and reused for the others.
+        """
+        if isProxy(ob, Proxy):
+            key = (type(removeSecurityProxy(ob)), getChecker(ob))
+        else:
+            key = (type(ob), None)
+        unwritable = self.__dict__.setdefault('_unwritable', {})
+        names = unwritable.get(key)
+        if names is None:
+            names = unwritable[key] = frozenset(
+                getUnwritableFields(ob, self.schema, self.fieldNames))
+        return names
+
+    def renderRows(self):
+        """Renders the rows of the batch, yielding a unicode chunk per row."""
+        for row in self.rows():
+            cells = []
+            for widget in row.widgets():
+                error = widget.error()
+                if error:
+                    error = u'<div class="error">%s</div>' % error
+                cells.append(u'<td>%s%s</td>' % (widget(), error))
+            yield u'<tr>%s</tr>\n' % u''.join(cells)
+
+    def titles(self):
+        """Returns the titles of the fields, for the column headings."""
+        return [self.schema[name].title for name in self.fieldNames]
+
+    def _batchURL(self, start):
+        return '%s?batch_start=%d' % (self.request.URL, start)
+
+    def previousURL(self):
+        start = self.batchStart()
+        if start <= 0:
+            return None
+        return self._batchURL(max(start - self.batch_size, 0))
+
+    def nextURL(self):
+        start = self.batchStart() + self.batch_size
+        if start >= self.count():
+            return None
+        return self._batchURL(start)
+
+    def update(self):
+        if self.update_status is not None:
+            # We've been called before. Just return the status we previously
+            # computed.
+            return self.update_status
+
+        status = ''
+
+        if Update in self.request:
+            rows = self._rows = list(self._batch())
+            errors = []
+            for row in rows:
+                errors.extend(row.validate())
+            updated = 0
+            if not errors:
+                for row in rows:
+                    if row.update():
+                        updated += 1
+                    errors.extend(row.errors)
+            if errors:
+                self.errors = errors
+                status = _("An error occurred.")
+                transaction.doom()
+            elif updated:
+                status = _("Updated ${count} objects",
+                           mapping={'count': updated})
+
+        self.update_status = status
+        return status
+
+    def __call__(self):
+        return self.template()
+
+
+def makeGridEditViewClass(name, schema, label, permission, template,
+                          default_template, bases, fields, batch_size=None):
+    dict_ = {'__name__': name}
+    if template is not None:
+        # share the compiled templates between all generated classes
+        dict_['template'] = sharedTemplate(template)
+    class_ = type("GridEditView for %s" % str(name), bases, dict_)
+    class_.__used_for__ = schema
+    class_.schema = schema
+    class_.label = label
+    class_.fieldNames = fields
+    if batch_size is not None:
+        class_.batch_size = batch_size
+    defineChecker(class_,
+                  NamesChecker(("__call__", "__getitem__", "browserDefault"),
+                               permission))
+    return class_
+
+
+def GridEditViewFactory(name, schema, label, permission, layer,
+                        template, default_template, bases, for_, fields,
+                        batch_size=None, deferred=False):
+    args = (name, schema, label, permission, template, default_template,
+            bases, fields, batch_size)
+    if deferred:
+        factory = DeferredViewFactory(makeGridEditViewClass, *args)
+    else:
+        factory = makeGridEditViewClass(*args)
+
+    if layer is None:
+        layer = IDefaultBrowserLayer
+
+    sm = zope.component.getGlobalSiteManager()
+    sm.registerAdapter(factory, (for_, layer), Interface, name)
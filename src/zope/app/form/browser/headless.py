@@ -0,0 +1,176 @@
+##############################################################################
+#
+# Copyright (c) 2010 Zope Foundation and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""Support for JSON requests to edit and add forms
+
+Edit and add views with a true `accept_json` attribute handle POST
+requests with a JSON object as body without setting up widgets or
+rendering a template. The object maps field names to values; the
+response is a JSON object with a ``status`` of ``"ok"`` or ``"error"``,
+and an ``errors`` object mapping field names to error messages. Errors
+that don't belong to a field are reported for the empty name.
+
+$Id$
+"""
+__docformat__ = 'restructuredtext'
+
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from zope.datetime import parseDatetimetz, DateTimeError
+from zope.i18n import translate
+from zope.schema.interfaces import ValidationError, RequiredMissing
+from zope.schema.interfaces import IFromUnicode
+
+from zope.app.form.browser.i18n import _
+
+JSON_CONTENT_TYPE = 'application/json'
+
+def isJSONRequest(request):
+    """Tells whether `request` posts a JSON body."""
+    if getattr(request, 'method', None) != 'POST':
+        return False
+    content_type = request.getHeader('Content-Type') or ''
+    return content_type.split(';')[0].strip().lower() == JSON_CONTENT_TYPE
+
+def readJSONData(request):
+    """Returns the JSON object posted with `request`.
+
+    Raises `ValueError` if the body is not a JSON object in the charset
+    of the request.
+    """
+    body = request.bodyStream.read()
+    charset = 'utf-8'
+    for param in (request.getHeader('Content-Type') or '').split(';')[1:]:
+        key, sep, value = param.partition('=')
+        if key.strip().lower() == 'charset' and value.strip():
+            charset = value.strip().strip('"')
+    try:
+        body = body.decode(charset)
+    except (LookupError, UnicodeDecodeError), error:
+        raise ValueError(str(error))
+    data = json.loads(body)
+    if not isinstance(data, dict):
+        raise ValueError("The body is not a JSON object")
+    return data
+
+def errorMessage(error, request):
+    """Returns the translated message of a validation or conversion error."""
+    if getattr(error, 'doc', None) is not None:
+        message = error.doc()
+    else:
+        message = error.args and error.args[0] or error.__class__.__name__
+    if not isinstance(message, basestring):
+        message = unicode(message)
+    return translate(message, context=request, default=message)
+
+_collection_types = (tuple, list, set, frozenset)
+
+def convertJSONValue(field, value):
+    """Returns the value of `field` for the JSON `value`.
+
+    Strings are converted with ``fromUnicode`` for fields supporting it,
+    and parsed as ISO 8601 dates for date and datetime fields. Lists are
+    converted to the type of collection fields, item by item, and
+    integers to floats and decimals. Other values are returned as they
+    are. Raises `ValueError` for strings that can't be converted.
+    """
+    type_ = field._type
+    if isinstance(value, basestring):
+        if IFromUnicode.providedBy(field):
+            return field.fromUnicode(unicode(value))
+        if type_ is datetime or type_ is date:
+            try:
+                value = parseDatetimetz(value)
+            except (DateTimeError, IndexError), error:
+                raise ValueError(str(error))
+            if type_ is date:
+                value = value.date()
+    elif isinstance(value, list) and type_ in _collection_types:
+        value_type = getattr(field, 'value_type', None)
+        if value_type is not None:
+            value = [convertJSONValue(value_type, item) for item in value]
+        try:
+            value = type_(value)
+        except TypeError, error:
+            raise ValueError(str(error))
+    elif (isinstance(value, (int, long)) and not isinstance(value, bool)
+          and (type_ is float or type_ is Decimal)):
+        value = type_(value)
+    return value
+
+def convertData(view, data, required=False):
+    """Returns the values for the fields of `view` from the mapping `data`.
+
+    Returns a ``(values, errors)`` pair; `errors` maps field names to the
+    exceptions raised for them. The values are converted with
+    `convertJSONValue` and validated. Unknown and read-only fields are
+    errors. If `required` is true, missing required fields are errors too.
+    """
+    schema = view.schema
+    names = view.fieldNames
+    values = {}
+    errors = {}
+    for name in data:
+        if name not in names:
+            errors[name] = ValueError(_("No such field"))
+    for name in names:
+        field = schema[name]
+        if name not in data:
+            if required and field.required:
+                errors[name] = RequiredMissing(name)
+            continue
+        if field.readonly:
+            errors[name] = ValueError(_("The field is read-only"))
+            continue
+        field = field.bind(view.context)
+        value = data[name]
+        try:
+            value = convertJSONValue(field, value)
+            field.validate(value)
+        except (ValidationError, ValueError), error:
+            errors[name] = error
+        else:
+            values[name] = value
+    return values, errors
+
+def convertJSONData(view, data, required=False):
+    """Returns the values for the fields of `view` from JSON `data`.
+
+    This works like `convertData`, but the errors are translated messages.
+    """
+    values, errors = convertData(view, data, required)
+    request = view.request
+    for name, error in errors.items():
+        errors[name] = errorMessage(error, request)
+    return values, errors
+
+def widgetsErrors(errors, request):
+    """Returns the errors of a `WidgetsError` keyed by field name."""
+    result = {}
+    for error in errors:
+        name = getattr(error, 'field_name', None) or ''
+        message = errorMessage(error, request)
+        if name in result:
+            message = result[name] + u'\n' + message
+        result[name] = message
+    return result
+
+def renderJSON(view, result):
+    """Returns the JSON response for `result`."""
+    response = view.request.response
+    response.setHeader('Content-Type', JSON_CONTENT_TYPE)
+    if result.get('status') == 'error' and response.getStatus() in (200, 599):
+        response.setStatus(400)
+    return json.dumps(result)
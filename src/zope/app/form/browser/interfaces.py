@@ -17,7 +17,7 @@ $Id$
 """
 __docformat__ = 'restructuredtext'
 
-from zope.interface import Interface
+from zope.interface import Interface, Attribute
 from zope.schema import TextLine, Bool
 from zope.formlib.interfaces import IWidget, IInputWidget
 
@@ -114,3 +114,20 @@ class IAddFormCustomization(Interface):
         i.e. it delegates to the `IAdding` view.
         """
 
+
+
+class IModificationStamp(Interface):
+    """Tells whether and when an object changed, for conditional requests.
+
+    Adapt objects to this interface to let the views generated by the
+    ``editform`` and ``schemadisplay`` directives answer conditional GET
+    requests for objects that are not persistent, or that change without
+    their own persistent state changing.
+    """
+
+    stamp = Attribute(
+        """A string that changes whenever the displayed data changes""")
+
+    modified = Attribute(
+        """The time of the last change in seconds since the epoch or None
+        if unknown""")
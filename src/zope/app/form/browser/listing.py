@@ -0,0 +1,271 @@
+##############################################################################
+#
+# Copyright (c) 2010 Zope Foundation and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""Display many objects against one schema as a table
+
+$Id$
+"""
+__docformat__ = 'restructuredtext'
+
+from cgi import escape
+from itertools import islice
+from urllib import urlencode
+
+import zope.component
+from zope.interface import Interface, implements
+from zope.i18n import translate
+from zope.publisher.browser import BrowserView
+from zope.publisher.interfaces.browser import IDefaultBrowserLayer
+from zope.publisher.interfaces.http import IResult
+from zope.schema import getFieldNamesInOrder
+from zope.security.checker import defineChecker, NamesChecker
+from zope.security.interfaces import Unauthorized, ForbiddenAttribute
+
+from zope.formlib.interfaces import IDisplayWidget, IWidgetFactory
+from zope.app.form.utility import getFieldPlan
+from zope.app.form.browser.i18n import _
+from zope.app.form.browser.deferred import DeferredViewFactory
+from zope.app.form.browser.template import sharedTemplate
+
+
+class ListingResult(object):
+    """The encoded chunks of a rendered listing
+
+    The chunks are written to the response one by one, instead of being
+    joined into one string first. They are all rendered before the view
+    returns.
+    """
+
+    implements(IResult)
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    def __iter__(self):
+        return iter(self.chunks)
+
+
+class ListingView(BrowserView):
+    """Display-view for the items of the context, one row per object.
+
+    Subclasses should provide a `schema` attribute defining the schema
+    to be displayed. The objects are the items of the context, see
+    `items`.
+
+    The fields are bound to the object of each row, and a display widget
+    is set up for each cell. Custom widget factories are taken from the
+    ``<name>_widget`` attributes of the view.
+
+    If `batch_size` is given, the items are shown in batches, selected by
+    the ``batch_start`` request variable. The items are sorted by the
+    field named by the ``sort_on`` request variable, or `sort_on`, if
+    any; ``sort_order=reverse`` or `sort_reverse` reverses the order.
+
+    Unless the view has an `index` template, the table is rendered row by
+    row into a list of chunks, see `ListingResult`.
+    """
+
+    label = ''
+    batch_size = None
+    sort_on = None
+    sort_reverse = False
+    index = None
+
+    # Fall-back field names computes from schema
+    fieldNames = property(lambda self: getFieldNamesInOrder(self.schema))
+
+    def items(self):
+        """Returns an iterable of the ``(key, object)`` pairs to show."""
+        return self.context.items()
+
+    def count(self):
+        """Returns the number of objects to show."""
+        return len(self.context)
+
+    def batchStart(self):
+        try:
+            start = int(self.request.get('batch_start', 0))
+        except ValueError:
+            start = 0
+        return max(start, 0)
+
+    def sortOn(self):
+        """Returns the name of the field to sort on, or ``None``."""
+        name = self.request.get('sort_on', self.sort_on)
+        if name in self.fieldNames:
+            return name
+        return None
+
+    def sortReverse(self):
+        order = self.request.get('sort_order')
+        if order is None:
+            return self.sort_reverse
+        return order == 'reverse'
+
+    def columns(self):
+        """Returns the ``(name, field)`` of each column."""
+        return getFieldPlan(self.schema, self.fieldNames).fields
+
+    def _widget(self, name, field):
+        factory = getattr(self, name + '_widget', None)
+        if IWidgetFactory.providedBy(factory):
+            return factory(field, self.request)
+        return zope.component.getMultiAdapter((field, self.request),
+                                              IDisplayWidget)
+
+    def titles(self):
+        """Returns the titles of the fields, for the column headings."""
+        return [field.title for name, field in self.columns()]
+
+    def _sorted(self, items):
+        name = self.sortOn()
+        if name is None:
+            if self.sortReverse():
+                items = reversed(list(items))
+            return items
+        field = self.schema[name]
+        schema = self.schema
+        def key(item):
+            try:
+                return field.query(schema(item[1]))
+            except (Unauthorized, ForbiddenAttribute):
+                return None
+        return sorted(items, key=key, reverse=self.sortReverse())
+
+    def batch(self):
+        """Returns the ``(key, object)`` pairs of the current batch."""
+        items = self._sorted(self.items())
+        if self.batch_size is None:
+            return items
+        start = self.batchStart()
+        return islice(items, start, start + self.batch_size)
+
+    def rows(self):
+        """Returns the rows of the current batch.
+
+        Each row is a dictionary with the `key`, the `object` and the
+        rendered `cells`. The rows are rendered one by one as they are
+        iterated.
+        """
+        columns = self.columns()
+        schema = self.schema
+        for key, ob in self.batch():
+            adapted = schema(ob)
+            cells = []
+            for name, field in columns:
+                field = field.bind(ob)
+                try:
+                    value = field.get(adapted)
+                except (Unauthorized, ForbiddenAttribute):
+                    cells.append(u'')
+                    continue
+                widget = self._widget(name, field)
+                widget.setRenderedValue(value)
+                cells.append(widget())
+            yield {'key': key, 'object': ob, 'cells': cells}
+
+    def _batchURL(self, start):
+        query = [('batch_start', start)]
+        for name in ('sort_on', 'sort_order'):
+            value = self.request.get(name)
+            if value:
+                if isinstance(value, unicode):
+                    value = value.encode('utf-8')
+                query.append((name, value))
+        return '%s?%s' % (self.request.URL, urlencode(query))
+
+    def previousURL(self):
+        start = self.batchStart()
+        if self.batch_size is None or start <= 0:
+            return None
+        return self._batchURL(max(start - self.batch_size, 0))
+
+    def nextURL(self):
+        if self.batch_size is None:
+            return None
+        start = self.batchStart() + self.batch_size
+        if start >= self.count():
+            return None
+        return self._batchURL(start)
+
+    def renderChunks(self):
+        """Renders the table, yielding a unicode chunk per row."""
+        request = self.request
+        yield u'<table class="listing">\n'
+        if self.label:
+            yield u'<caption>%s</caption>\n' % escape(
+                translate(self.label, context=request))
+        yield u'<thead>\n<tr>'
+        for title in self.titles():
+            yield u'<th>%s</th>' % escape(translate(title, context=request))
+        yield u'</tr>\n</thead>\n<tbody>\n'
+        for row in self.rows():
+            yield u'<tr>%s</tr>\n' % u''.join(
+                [u'<td>%s</td>' % cell for cell in row['cells']])
+        yield u'</tbody>\n</table>\n'
+        for url, title in ((self.previousURL(), _('Previous')),
+                           (self.nextURL(), _('Next'))):
+            if url is not None:
+                yield u'<a href="%s">%s</a>\n' % (
+                    escape(url, True), translate(title, context=request))
+
+    def __call__(self, *args, **kw):
+        if self.index is not None:
+            return self.index(*args, **kw)
+        # The chunks must be rendered while the objects can be accessed,
+        # the result is iterated after the transaction has ended, so
+        # nothing is streamed.
+        charset = 'utf-8'
+        self.request.response.setHeader(
+            'Content-Type', 'text/html;charset=%s' % charset)
+        return ListingResult(
+            [chunk.encode(charset) for chunk in self.renderChunks()])
+
+
+def makeListingViewClass(name, schema, label, permission, template,
+                         default_template, bases, fields,
+                         batch_size=None, sort_on=None, sort_reverse=False):
+    dict_ = {'__name__': name}
+    if template is not None:
+        # share the compiled templates between all generated classes
+        dict_['index'] = sharedTemplate(template)
+    class_ = type("ListingView for %s" % str(name), bases, dict_)
+    class_.__used_for__ = schema
+    class_.schema = schema
+    class_.label = label
+    class_.fieldNames = fields
+    class_.batch_size = batch_size
+    class_.sort_on = sort_on
+    class_.sort_reverse = sort_reverse
+    defineChecker(class_,
+                  NamesChecker(("__call__", "__getitem__", "browserDefault"),
+                               permission))
+    return class_
+
+
+def ListingViewFactory(name, schema, label, permission, layer,
+                       template, default_template, bases, for_, fields,
+                       batch_size=None, sort_on=None, sort_reverse=False,
+                       deferred=False):
+    args = (name, schema, label, permission, template, default_template,
+            bases, fields, batch_size, sort_on, sort_reverse)
+    if deferred:
+        factory = DeferredViewFactory(makeListingViewClass, *args)
+    else:
+        factory = makeListingViewClass(*args)
+
+    if layer is None:
+        layer = IDefaultBrowserLayer
+
+    sm = zope.component.getGlobalSiteManager()
+    sm.registerAdapter(factory, (for_, layer), Interface, name)
@@ -17,10 +17,16 @@ $Id$
 """
 __docformat__ = 'restructuredtext'
 
-from zope.component import getMultiAdapter
-from zope.interface import implements
+import weakref
+
+from zope.component import getMultiAdapter, getSiteManager
+from zope.interface import Interface, implements, providedBy
 from zope.interface.common.mapping import IItemMapping
 from zope.publisher.browser import BrowserView
+from zope.browserpage.simpleviewclass import simple
+
+# {adapter registry: {page factories: {macro name: entry}}}
+_index = weakref.WeakKeyDictionary()
 
 class FormMacros(BrowserView):
     implements(IItemMapping)
@@ -36,16 +42,57 @@ class FormMacros(BrowserView):
         'addingdialog': 'page',
         }
 
-    def __getitem__(self, key):
-        key = self.aliases.get(key, key)
+    def _macroIndex(self):
+        """Returns the macro index for the context and request.
+
+        The index maps macro names to ``(template, page name)`` pairs, where
+        template is the template of a page registered with a template and
+        ``None`` otherwise, or to ``None`` if no page provides the macro.
+        Indexes are kept per adapter registry for the factories of the
+        macro pages. These are found with the cached lookup of the
+        registry, so a changed registration yields another index.
+        """
+        registry = getSiteManager().adapters
+        required = (providedBy(self.context), providedBy(self.request))
+        factories = tuple([(name, registry.lookup(required, Interface, name))
+                           for name in self.macro_pages])
+        indexes = _index.get(registry)
+        if indexes is None:
+            indexes = _index[registry] = {}
+        index = indexes.get(factories)
+        if index is None:
+            index = indexes[factories] = {}
+        return index
+
+    def _findMacro(self, key):
         context = self.context
         request = self.request
         for name in self.macro_pages:
             page = getMultiAdapter((context, request), name=name)
             try:
-                v = page[key]
+                page[key]
             except KeyError:
                 pass
             else:
-                return v
-        raise KeyError(key)
+                class_ = type(page)
+                if (isinstance(page, simple) and
+                    class_.__getitem__ == simple.__getitem__):
+                    # The macros only depend on the template of the class
+                    return class_.index, name
+                return None, name
+        return None
+
+    def __getitem__(self, key):
+        key = self.aliases.get(key, key)
+        index = self._macroIndex()
+        try:
+            entry = index[key]
+        except KeyError:
+            entry = index[key] = self._findMacro(key)
+        if entry is None:
+            raise KeyError(key)
+        template, name = entry
+        if template is not None:
+            return template.macros[key]
+        page = getMultiAdapter((self.context, self.request), name=name)
+        return page[key]
@@ -22,6 +22,7 @@ import os
 import zope.component
 from zope.security.checker import CheckerPublic
 from zope.interface import implementedBy
+from zope.interface.common.mapping import IEnumerableMapping
 from zope.configuration.exceptions import ConfigurationError
 
 from zope.browser.interfaces import IAdding
@@ -34,10 +35,66 @@ from zope.formlib.widget import CustomWidgetFactory
 from zope.app.form.browser.i18n import _
 from zope.formlib.interfaces import IInputWidget, IDisplayWidget
 from zope.formlib.interfaces import IWidgetFactory
-from add import AddView, AddViewFactory
+from zope.app.form.utility import _registerCleanUp
+from add import AddView, AddViewFactory, makeArgumentPlan
 from editview import EditView, EditViewFactory
 from formview import FormView
 from schemadisplay import DisplayView, DisplayViewFactory
+from listing import ListingView, ListingViewFactory
+from gridedit import GridEditView, GridEditViewFactory
+
+# Widget factories and custom widget mixin classes are interned, so that
+# forms declaring the same widgets share them.
+# {(widget factory, attributes): CustomWidgetFactory}
+_widget_factories = {}
+# {widget attributes: mixin class}
+_widget_mixins = {}
+# {widget attributes: number of forms}
+_widget_mixin_uses = {}
+
+def _internWidgetFactory(class_, attrs):
+    try:
+        key = (class_, frozenset([(name, type(value), value)
+                                  for name, value in attrs.items()]))
+        factory = _widget_factories.get(key)
+    except TypeError:
+        # unhashable factory or attribute values
+        return CustomWidgetFactory(class_, **attrs)
+    if factory is None:
+        factory = _widget_factories[key] = CustomWidgetFactory(
+            class_, **attrs)
+    return factory
+
+def _internWidgetsMixin(widgets):
+    try:
+        key = frozenset(widgets.items())
+        mixin = _widget_mixins.get(key)
+    except TypeError:
+        return type('CustomWidgetsMixin', (object,), widgets)
+    if mixin is None:
+        mixin = _widget_mixins[key] = type('CustomWidgetsMixin', (object,),
+                                           widgets)
+    _widget_mixin_uses[key] = _widget_mixin_uses.get(key, 0) + 1
+    return mixin
+
+def customWidgetsReport():
+    """Returns how many custom widget mixins were generated.
+
+    The result maps ``forms`` to the number of forms with widget
+    subdirectives, ``mixins`` to the number of distinct mixin classes and
+    ``factories`` to the number of distinct widget factories created for
+    them.
+    """
+    return {'forms': sum(_widget_mixin_uses.values()),
+            'mixins': len(_widget_mixins),
+            'factories': len(_widget_factories)}
+
+def _clearCustomWidgets():
+    _widget_factories.clear()
+    _widget_mixins.clear()
+    _widget_mixin_uses.clear()
+
+_registerCleanUp(_clearCustomWidgets)
 
 class BaseFormDirective(object):
 
@@ -51,6 +108,7 @@ class BaseFormDirective(object):
     permission = CheckerPublic
     template = None
     class_ = None
+    deferred = False
 
     # default form information
     title = None
@@ -90,15 +148,13 @@ class BaseFormDirective(object):
         if IWidgetFactory.providedBy(class_):
             factory = class_
         else:
-            factory = CustomWidgetFactory(class_, **attrs)
+            factory = _internWidgetFactory(class_, attrs)
 
         self._widgets[field+'_widget'] = factory
 
     def _processWidgets(self):
         if self._widgets:
-            customWidgetsObject = type('CustomWidgetsMixin', (object,),
-                                       self._widgets)
-            self.bases = self.bases + (customWidgetsObject,)
+            self.bases = self.bases + (_internWidgetsMixin(self._widgets),)
 
     def _normalize(self):
         if self.for_ is None:
@@ -119,8 +175,9 @@ class BaseFormDirective(object):
         self.names = getFieldNamesInOrder(self.schema)
 
         if self.fields:
+            names = frozenset(self.names)
             for name in self.fields:
-                if name not in self.names:
+                if name not in names:
                     raise ValueError("Field name is not in schema",
                                      name, self.schema)
         else:
@@ -155,7 +212,8 @@ class AddFormDirective(BaseFormDirective):
     set_before_add = None
     set_after_add = None
 
-    def _default_widget_factory(self, field, request):
+    @staticmethod
+    def _default_widget_factory(field, request):
         # `field` is a bound field
         return zope.component.getMultiAdapter(
             (field, request), IInputWidget)
@@ -173,56 +231,11 @@ class AddFormDirective(BaseFormDirective):
                 description=self.description)
 
     def _handle_arguments(self, leftover=None):
-        schema = self.schema
-        fields = self.fields
-        arguments = self.arguments
-        keyword_arguments = self.keyword_arguments
-        set_before_add = self.set_before_add
-        set_after_add = self.set_after_add
-
-        if leftover is None:
-            leftover = fields
-
-        if arguments:
-            missing = [n for n in arguments if n not in fields]
-            if missing:
-                raise ValueError("Some arguments are not included in the form",
-                                 missing)
-            optional = [n for n in arguments if not schema[n].required]
-            if optional:
-                raise ValueError("Some arguments are optional, use"
-                                 " keyword_arguments for them",
-                                 optional)
-            leftover = [n for n in leftover if n not in arguments]
-
-        if keyword_arguments:
-            missing = [n for n in keyword_arguments if n not in fields]
-            if missing:
-                raise ValueError(
-                    "Some keyword_arguments are not included in the form",
-                    missing)
-            leftover = [n for n in leftover if n not in keyword_arguments]
-
-        if set_before_add:
-            missing = [n for n in set_before_add if n not in fields]
-            if missing:
-                raise ValueError(
-                    "Some set_before_add are not included in the form",
-                    missing)
-            leftover = [n for n in leftover if n not in set_before_add]
-
-        if set_after_add:
-            missing = [n for n in set_after_add if n not in fields]
-            if missing:
-                raise ValueError(
-                    "Some set_after_add are not included in the form",
-                    missing)
-            leftover = [n for n in leftover if n not in set_after_add]
-
-            self.set_after_add += leftover
-
-        else:
-            self.set_after_add = leftover
+        plan = makeArgumentPlan(self.schema, self.fields, self.arguments,
+                                self.keyword_arguments, self.set_before_add,
+                                self.set_after_add, leftover)
+        self.set_after_add = list(plan.set_after_add)
+        self.argument_plan = plan
 
     def _handle_content_factory(self):
         if self.content_factory is None:
@@ -240,13 +253,16 @@ class AddFormDirective(BaseFormDirective):
             args=self._args()+(self.content_factory, self.arguments,
                                  self.keyword_arguments,
                                  self.set_before_add, self.set_after_add),
+            kw={'argument_plan': self.argument_plan,
+                'deferred': self.deferred},
             )
 
 class EditFormDirectiveBase(BaseFormDirective):
 
     view = EditView
 
-    def _default_widget_factory(self, field, request):
+    @staticmethod
+    def _default_widget_factory(field, request):
         # `field` is a bound field
         if field.readonly:
             iface = IDisplayWidget
@@ -259,6 +275,8 @@ class EditFormDirective(EditFormDirectiveBase):
 
     default_template = 'edit.pt'
     title = _('Edit')
+    redirect_after_post = False
+    conditional_get = False
 
     def _handle_menu(self):
         if self.menu:
@@ -274,6 +292,9 @@ class EditFormDirective(EditFormDirectiveBase):
             discriminator=self._discriminator(),
             callable=EditViewFactory,
             args=self._args(),
+            kw={'deferred': self.deferred,
+                'redirect_after_post': self.redirect_after_post,
+                'conditional_get': self.conditional_get},
         )
 
 class FormDirective(EditFormDirective):
@@ -304,6 +325,7 @@ class SubeditFormDirective(EditFormDirectiveBase):
             discriminator = self._discriminator(),
             callable = EditViewFactory,
             args = self._args()+(self.fulledit_path, self.fulledit_label),
+            kw = {'deferred': self.deferred},
             )
 
 
@@ -312,11 +334,73 @@ class SchemaDisplayDirective(EditFormDirective):
     view = DisplayView
     default_template = 'display.pt'
 
+    # default output cache information
+    cache_size = None
+    cache_ttl = None
+
     def __call__(self):
         self._processWidgets()
         self._handle_menu()
         self._context.action(
             discriminator = self._discriminator(),
             callable = DisplayViewFactory,
-            args = self._args()+(self.menu,)
+            args = self._args()+(self.menu,),
+            kw = {'cache_size': self.cache_size,
+                  'cache_ttl': self.cache_ttl,
+                  'deferred': self.deferred,
+                  'conditional_get': self.conditional_get},
+            )
+
+
+class SchemaListingDirective(EditFormDirective):
+
+    view = ListingView
+    default_template = None
+
+    # default listing information
+    batch_size = None
+    sort_on = None
+    sort_reverse = False
+
+    @staticmethod
+    def _default_widget_factory(field, request):
+        # `field` is a bound field
+        return zope.component.getMultiAdapter(
+            (field, request), IDisplayWidget)
+
+    def __call__(self):
+        if self.sort_on is not None and self.sort_on not in self.fields:
+            raise ValueError("sort_on is not one of the fields",
+                             self.sort_on)
+        self._processWidgets()
+        self._handle_menu()
+        self._context.action(
+            discriminator = self._discriminator(),
+            callable = ListingViewFactory,
+            args = self._args(),
+            kw = {'batch_size': self.batch_size,
+                  'sort_on': self.sort_on,
+                  'sort_reverse': self.sort_reverse,
+                  'deferred': self.deferred},
+            )
+
+
+class GridEditFormDirective(EditFormDirective):
+
+    view = GridEditView
+    default_template = None
+
+    # default grid edit form information
+    for_ = IEnumerableMapping
+    batch_size = None
+
+    def __call__(self):
+        self._processWidgets()
+        self._handle_menu()
+        self._context.action(
+            discriminator = self._discriminator(),
+            callable = GridEditViewFactory,
+            args = self._args(),
+            kw = {'batch_size': self.batch_size,
+                  'deferred': self.deferred},
             )
@@ -21,7 +21,7 @@ from zope.interface import Interface
 from zope.configuration.fields import GlobalObject, GlobalInterface
 from zope.configuration.fields import Tokens, Path, Bool, PythonIdentifier
 from zope.configuration.fields import MessageID
-from zope.schema import Text, TextLine, Id
+from zope.schema import Text, TextLine, Id, Int
 from zope.security.zcml import Permission
 from zope.browsermenu.field import MenuField
 
@@ -85,6 +85,15 @@ class ICommonInformation(Interface):
         required=False
         )
 
+    deferred = Bool(
+        title=u"Deferred",
+        description=u"""
+        If true, the view class is only generated when the view is first
+        looked up, instead of while the configuration is executed.""",
+        required=False,
+        default=False
+        )
+
 
 class ICommonFormInformation(ICommonInformation):
     """
@@ -182,7 +191,38 @@ class ICommonAddInformation(Interface):
         )
 
 
-class IFormDirective(ICommonFormInformation):
+class ICommonEditInformation(Interface):
+    """
+    Common information for forms changing data
+    """
+
+    redirect_after_post = Bool(
+        title=u"Redirect after POST",
+        description=u"""
+        If true, a successful update redirects back to the form rather
+        than rendering it again. The status message is shown by the
+        following request.""",
+        required=False
+        )
+
+
+class ICommonConditionalInformation(Interface):
+    """
+    Common information for views answering conditional requests
+    """
+
+    conditional_get = Bool(
+        title=u"Conditional GET",
+        description=u"""
+        If true, GET requests with an If-None-Match or If-Modified-Since
+        header matching the current page are answered with status 304.
+        Persistent objects are supported, other objects need an
+        IModificationStamp adapter.""",
+        required=False
+        )
+
+
+class IFormDirective(ICommonFormInformation, ICommonEditInformation):
     """
     Define an automatically generated form.
 
@@ -200,7 +240,8 @@ class IFormDirective(ICommonFormInformation):
         required=True
         )
 
-class IEditFormDirective(ICommonFormInformation):
+class IEditFormDirective(ICommonFormInformation, ICommonEditInformation,
+                         ICommonConditionalInformation):
     """
     Define an automatically generated edit form
 
@@ -252,7 +293,8 @@ class IAddFormDirective(ICommonFormInformation, ICommonAddInformation):
         required=False
         )
 
-class ISchemaDisplayDirective(ICommonFormInformation):
+class ISchemaDisplayDirective(ICommonFormInformation,
+                              ICommonConditionalInformation):
     """
     Define an automatically generated display form.
 
@@ -266,6 +308,91 @@ class ISchemaDisplayDirective(ICommonFormInformation):
         required=False
         )
 
+    cache_size = Int(
+        title=u"Output cache size",
+        description=u"""
+        If given, the rendered pages are cached, and at most this many
+        pages are kept. Cached pages are dropped when their object is
+        modified.""",
+        required=False,
+        min=1
+        )
+
+    cache_ttl = Int(
+        title=u"Output cache lifetime",
+        description=u"""
+        The number of seconds a cached page is kept, 300 by default.""",
+        required=False,
+        min=1
+        )
+
+
+class ISchemaListingDirective(ICommonFormInformation):
+    """
+    Define an automatically generated listing.
+
+    The schemalisting directive creates and registers a view for
+    displaying the items of a container as a table, with a row per item
+    and a column per schema field.
+    """
+
+    title = MessageID(
+        title=u"The browser menu label for the listing",
+        required=False
+        )
+
+    batch_size = Int(
+        title=u"Batch size",
+        description=u"""
+        If given, the items are shown in batches of this size.""",
+        required=False,
+        min=1
+        )
+
+    sort_on = PythonIdentifier(
+        title=u"Sort on",
+        description=u"""
+        The name of the field the items are sorted on by default.""",
+        required=False
+        )
+
+    sort_reverse = Bool(
+        title=u"Reverse sort order",
+        description=u"If true, the items are sorted in reverse order.",
+        required=False,
+        default=False
+        )
+
+
+class IGridEditFormDirective(ICommonFormInformation):
+    """
+    Define an automatically generated grid edit form.
+
+    The grideditform directive creates and registers a view for editing
+    the items of a container in one form, with a row of widgets per item
+    and a column per schema field.
+    """
+
+    for_ = GlobalInterface(
+        title=u"Interface",
+        description=u"""
+        The interface of the containers this view applies to.
+
+        The items of the containers must implement or be adaptable to
+        the schema. By default, the view is registered for
+        zope.interface.common.mapping.IEnumerableMapping, which
+        containers extend.""",
+        required=False
+        )
+
+    batch_size = Int(
+        title=u"Batch size",
+        description=u"""
+        The number of items edited at a time, 20 by default.""",
+        required=False,
+        min=1
+        )
+
 
 class IWidgetSubdirective(Interface):
     """Register custom widgets for a form.
@@ -0,0 +1,102 @@
+##############################################################################
+#
+# Copyright (c) 2010 Zope Foundation and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""Validation rules of form fields for clients
+
+The rules describe the constraints of the fields of a form, so that
+browsers can reject obviously invalid input before submitting it. They
+are no substitute for the validation done by the server.
+
+The rules of a field are a mapping with the field `name`, the `type`
+(the class name of the field), whether the field is `required` and
+`readonly`, and, where the field has them, ``min_length``,
+``max_length``, ``min``, ``max`` and the ``tokens`` of a fixed,
+tokenized vocabulary of at most `MAX_TOKENS` terms.
+
+$Id$
+"""
+__docformat__ = 'restructuredtext'
+
+import weakref
+
+from zope.schema.interfaces import IMinMaxLen, IOrderable, IChoice
+from zope.schema.interfaces import IVocabularyTokenized, IIterableVocabulary
+
+from zope.app.form.utility import getFieldPlan, _registerCleanUp
+
+# Name under which edit and add views publish their rules
+RULES_NAME = 'validation-rules.json'
+
+# Larger vocabularies are not described
+MAX_TOKENS = 200
+
+def _ruleValue(value):
+    # Returns `value` in a form JSON can represent, or None
+    if isinstance(value, (bool, int, long, float, basestring)):
+        return value
+    isoformat = getattr(value, 'isoformat', None)
+    if isoformat is not None:
+        return isoformat()
+    return None
+
+def fieldRules(name, field):
+    """Returns the rules of `field` that don't change at runtime."""
+    rules = {'name': name, 'type': field.__class__.__name__}
+    if IMinMaxLen.providedBy(field):
+        if field.min_length:
+            rules['min_length'] = field.min_length
+        if field.max_length is not None:
+            rules['max_length'] = field.max_length
+    if IOrderable.providedBy(field):
+        for key in ('min', 'max'):
+            value = _ruleValue(getattr(field, key, None))
+            if value is not None:
+                rules[key] = value
+    if IChoice.providedBy(field):
+        # Only fixed vocabularies are described, named ones and sources
+        # may depend on the context
+        vocabulary = field.vocabulary
+        if (IVocabularyTokenized.providedBy(vocabulary)
+            and IIterableVocabulary.providedBy(vocabulary)
+            and len(vocabulary) <= MAX_TOKENS):
+            rules['tokens'] = [term.token for term in vocabulary]
+    return rules
+
+# {FieldPlan: ((field, rules), ...)}
+_rules = weakref.WeakKeyDictionary()
+
+def getValidationRules(schema, names=None):
+    """Returns a list with the rules of the `names` fields of `schema`.
+
+    The constraints are computed once per field plan (see
+    `zope.app.form.utility.getFieldPlan`), so they are computed again
+    when the schema changes. `required` and `readonly` are read from the
+    fields each time.
+    """
+    plan = getFieldPlan(schema, names)
+    rules = _rules.get(plan)
+    if rules is None:
+        rules = _rules[plan] = tuple([(field, fieldRules(name, field))
+                                      for name, field in plan])
+    result = []
+    for field, field_rules in rules:
+        field_rules = field_rules.copy()
+        field_rules['required'] = bool(field.required)
+        field_rules['readonly'] = bool(field.readonly)
+        result.append(field_rules)
+    return result
+
+def _clearRules():
+    _rules.clear()
+
+_registerCleanUp(_clearRules)
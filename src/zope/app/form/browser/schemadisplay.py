@@ -24,8 +24,14 @@ from zope.publisher.browser import BrowserView
 from zope.schema import getFieldNamesInOrder
 from zope.security.checker import defineChecker, NamesChecker
 
-from zope.app.form.utility import setUpDisplayWidgets
-from zope.browserpage import ViewPageTemplateFile
+from zope.app.form.utility import setUpDisplayWidgets, setUpLazyWidgets
+from zope.app.form.browser.displaycache import DisplayCache, renderCached
+from zope.app.form.browser.displaycache import DEFAULT_TTL
+from zope.app.form.browser.template import sharedTemplate
+from zope.app.form.browser.deferred import DeferredViewFactory
+from zope.app.form.browser.timing import timed, timedFields
+from zope.app.form.browser.conditional import getValidators, isNotModified
+from zope.app.form.browser.conditional import answerConditional
 from zope.browserpage.simpleviewclass import SimpleViewClass
 
 class DisplayView(BrowserView):
@@ -33,23 +39,58 @@ class DisplayView(BrowserView):
 
     Subclasses should provide a `schema` attribute defining the schema
     to be displayed.
+
+    If `lazy_widgets` is true, each widget is only set up when its
+    attribute is first accessed.
+
+    If `output_cache` is a `DisplayCache`, the rendered page is cached in
+    it, and widgets are only set up when the page is rendered.
+
+    If `conditional_get` is true, GET requests for a page the client has
+    are answered with status 304 without setting up widgets, see
+    `zope.app.form.browser.conditional`.
     """
 
     errors = ()
     update_status = ''
     label = ''
+    lazy_widgets = False
+    output_cache = None
+    conditional_get = False
+    not_modified = False
+    validators = None
 
     # Fall-back field names computes from schema
     fieldNames = property(lambda self: getFieldNamesInOrder(self.schema))
 
     def __init__(self, context, request):
         super(DisplayView, self).__init__(context, request)
-        self._setUpWidgets()
+        if self.conditional_get:
+            self.validators = getValidators(self)
+            self.not_modified = isNotModified(request, self.validators)
+            if self.not_modified:
+                # The page is not rendered, widgets are only set up if
+                # they are used.
+                self._setUpLazyWidgets()
+                return
+        if self.lazy_widgets or self.output_cache is not None:
+            self._setUpLazyWidgets()
+        else:
+            self._setUpWidgets()
 
     def _setUpWidgets(self):
         self.adapted = self.schema(self.context)
-        setUpDisplayWidgets(self, self.schema, source=self.adapted,
-                            names=self.fieldNames)
+        timedFields(self, 'setup', setUpDisplayWidgets, self.fieldNames,
+                    self, self.schema, source=self.adapted)
+
+    def _setUpLazyWidgets(self):
+        self.adapted = self.schema(self.context)
+        setUpLazyWidgets(self, self.fieldNames)
+
+    def _setUpWidget(self, name):
+        # Called by the lazy widgets to set up a single widget
+        timedFields(self, 'setup', setUpDisplayWidgets, [name],
+                    self, self.schema, source=self.adapted)
 
     def setPrefix(self, prefix):
         for widget in self.widgets():
@@ -59,10 +100,21 @@ class DisplayView(BrowserView):
         return [getattr(self, name+'_widget')
                 for name in self.fieldNames]
 
+    def __call__(self, *args, **kw):
+        if answerConditional(self):
+            return u''
+        render = super(DisplayView, self).__call__
+        if self.output_cache is None or args or kw:
+            return timed(self, 'render', render, *args, **kw)
+        return timed(self, 'render', renderCached, self, self.output_cache,
+                     render)
 
-def DisplayViewFactory(name, schema, label, permission, layer,
-                       template, default_template, bases, for_, fields,
-                       fulledit_path=None, fulledit_label=None):
+
+def makeDisplayViewClass(name, schema, label, permission, template,
+                         default_template, bases, fields,
+                         fulledit_path=None, fulledit_label=None,
+                         cache_size=None, cache_ttl=None,
+                         conditional_get=False):
     class_ = SimpleViewClass(template, used_for=schema, bases=bases,
                              name=name)
     class_.schema = schema
@@ -72,13 +124,34 @@ def DisplayViewFactory(name, schema, label, permission, layer,
     if fulledit_path and (fulledit_label is None):
         fulledit_label = "Full display"
     class_.fulledit_label = fulledit_label
-    class_.generated_form = ViewPageTemplateFile(default_template)
+    # share the compiled templates between all generated classes
+    class_.index = sharedTemplate(template)
+    class_.generated_form = sharedTemplate(default_template)
+    if cache_size:
+        class_.output_cache = DisplayCache(cache_size,
+                                           cache_ttl or DEFAULT_TTL)
+    class_.conditional_get = conditional_get
     defineChecker(class_,
                   NamesChecker(("__call__", "__getitem__", "browserDefault"),
                                permission))
+    return class_
+
+
+def DisplayViewFactory(name, schema, label, permission, layer,
+                       template, default_template, bases, for_, fields,
+                       fulledit_path=None, fulledit_label=None,
+                       cache_size=None, cache_ttl=None, deferred=False,
+                       conditional_get=False):
+    args = (name, schema, label, permission, template, default_template,
+            bases, fields, fulledit_path, fulledit_label,
+            cache_size, cache_ttl, conditional_get)
+    if deferred:
+        factory = DeferredViewFactory(makeDisplayViewClass, *args)
+    else:
+        factory = makeDisplayViewClass(*args)
 
     if layer is None:
         layer = IDefaultBrowserLayer
 
     sm = zope.component.getGlobalSiteManager()
-    sm.registerAdapter(class_, (for_, layer), Interface, name)
+    sm.registerAdapter(factory, (for_, layer), Interface, name)
@@ -15,6 +15,8 @@
 
 Update -- Name of the standard update submit button
 
+UpdateField -- Name of the variable naming the single field to update
+
 $Id$
 """
 __docformat__ = 'restructuredtext'
@@ -22,3 +24,4 @@ __docformat__ = 'restructuredtext'
 Next = "NEXT_SUBMIT"
 Previous = "PREVIOUS_SUBMIT"
 Update = "UPDATE_SUBMIT"
+UpdateField = "UPDATE_FIELD"
@@ -0,0 +1,65 @@
+##############################################################################
+#
+# Copyright (c) 2010 Zope Foundation and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""Templates shared by generated form view classes
+
+$Id$
+"""
+__docformat__ = 'restructuredtext'
+
+import os
+import threading
+
+from zope.browserpage import ViewPageTemplateFile
+
+from zope.app.form.utility import _registerCleanUp
+
+_here = os.path.dirname(__file__)
+
+# {(absolute path, mtime): ViewPageTemplateFile}
+_templates = {}
+_lock = threading.Lock()
+
+def sharedTemplate(filename):
+    """Returns the `ViewPageTemplateFile` for `filename`.
+
+    Relative file names are relative to this package. All callers asking
+    for the same file get the same template object, so it is read and
+    compiled only once. A new template object is made if the file was
+    modified since.
+    """
+    path = os.path.abspath(os.path.join(_here, filename))
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        mtime = None
+    key = path, mtime
+    template = _templates.get(key)
+    if template is None:
+        _lock.acquire()
+        try:
+            template = _templates.get(key)
+            if template is None:
+                template = _templates[key] = ViewPageTemplateFile(path)
+        finally:
+            _lock.release()
+    return template
+
+def sharedTemplateCount():
+    """Returns the number of distinct templates handed out."""
+    return len(_templates)
+
+def _clearTemplates():
+    _templates.clear()
+
+_registerCleanUp(_clearTemplates)
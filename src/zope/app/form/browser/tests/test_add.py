@@ -18,7 +18,7 @@ $Id$
 import unittest
 
 from zope.browser.interfaces import IAdding
-from zope.component import getMultiAdapter
+from zope.component import getMultiAdapter, ComponentLookupError
 from zope.component.eventtesting import getEvents
 from zope.component.interfaces import IFactory
 from zope.component.interfaces import IComponentLookup
@@ -32,11 +32,13 @@ from zope.schema import TextLine, accessors
 from zope.security.checker import CheckerPublic
 from zope.site.site import SiteManagerAdapter
 
+from zope.formlib.interfaces import WidgetsError
 from zope.formlib.widget import CustomWidgetFactory
 from zope.app.form.browser import TextWidget as Text
 from zope.app.form.browser.add import AddViewFactory, AddView
+from zope.app.form.browser.add import makeArgumentPlan
 from zope.app.form.browser.metaconfigure import AddFormDirective
-from zope.app.form.browser.submit import Update
+from zope.app.form.browser.submit import Update, UpdateField
 from zope.app.testing import ztapi
 
 # Foo needs to be imported as globals() are checked
@@ -165,6 +167,22 @@ class Test(PlacelessSetup, unittest.TestCase):
         # cannot use an optional field in arguments
         self.assertRaises(ValueError, self._invoke_add, arguments=["extra2"])
 
+    def test_makeArgumentPlan(self):
+        fields = "name first last email address getfoo extra1 extra2".split()
+        plan = makeArgumentPlan(I, fields, ['first', 'last'], ['email'],
+                                ['getfoo'], ['extra1'])
+        self.assertEqual(plan.arguments, ('first', 'last'))
+        self.assertEqual(plan.keywords, (('email', 'email'),))
+        self.assertEqual(plan.before_add, (('getfoo', I['getfoo']),))
+        self.assertEqual(plan.set_after_add,
+                         ('extra1', 'name', 'address', 'extra2'))
+        self.assertEqual([field for name, field in plan.after_add],
+                         [I['extra1'], I['name'], I['address'], I['extra2']])
+        plan = makeArgumentPlan(I, fields, leftover=['name', 'extra1'])
+        self.assertEqual(plan.set_after_add, ('name', 'extra1'))
+        self.assertRaises(ValueError, makeArgumentPlan, I, ['name'],
+                          keyword_arguments=['email'])
+
     def test_add(self, args=None):
         self._invoke_add()
         (descriminator, callable, args, kw) = self._context.last_action
@@ -200,6 +218,9 @@ class Test(PlacelessSetup, unittest.TestCase):
                          "getfoo")
         self.assertEqual(" ".join(set_after_add),
                          "extra1 name address extra2")
+        # the factory gets the argument plan computed by the directive
+        self.assertEqual(kw['argument_plan'].set_after_add,
+                         tuple(set_after_add))
 
         return args
 
@@ -265,9 +286,10 @@ class Test(PlacelessSetup, unittest.TestCase):
         adding = Adding(self)
         self._invoke_add()
         (descriminator, callable, args, kw) = self._context.last_action
-        factory = AddViewFactory(*args)
+        factory = AddViewFactory(*args, **kw)
         request = TestRequest()
         view = getMultiAdapter((adding, request), name='addthis')
+        self.failUnless(view._argument_plan is kw['argument_plan'])
         content = view.create('a',0,abc='def')
 
         self.failUnless(isinstance(content, C))
@@ -311,6 +333,17 @@ class Test(PlacelessSetup, unittest.TestCase):
         self.assertEqual(content.args, ('a', 0))
         self.assertEqual(content.kw, {'abc':'def'})
 
+        # the factory is looked up again after the registrations change
+        factory = view._factory
+        view = getMultiAdapter((adding, request), name='addthis')
+        self.failUnless(view._factory is factory)
+        ztapi.provideUtility(IFactory, Factory(SampleData), name='C')
+        self.failUnless(isinstance(view.create(), SampleData))
+
+        # unknown factory ids are errors as before
+        view._factory = 'D'
+        self.assertRaises(ComponentLookupError, view.create)
+
     def test_createAndAdd(self):
 
         class Adding(object):
@@ -348,6 +381,186 @@ class Test(PlacelessSetup, unittest.TestCase):
         self.assertEqual(len(getEvents(IObjectCreatedEvent)), 1)
         self.assertEqual(len(getEvents(IObjectModifiedEvent)), 1)
 
+    def test_createAndAdd_describes_set_fields(self):
+
+        class Adding(object):
+
+            implements(IAdding)
+
+            def add(self, ob):
+                self.ob = ob
+                return ob
+
+        adding = Adding()
+        self._invoke_add()
+        (descriminator, callable, args, kw) = self._context.last_action
+        factory = AddViewFactory(*args)
+        request = TestRequest()
+        view = getMultiAdapter((adding, request), name='addthis')
+
+        data = dict(SampleData.__dict__)
+        del data['address']
+        data['extra2'] = None
+        view.createAndAdd(data)
+
+        [event] = getEvents(IObjectModifiedEvent)
+        self.assertEqual(event.descriptions[0].attributes,
+                         ('extra1', 'name'))
+
+        view.describe_all_fields = True
+        view.createAndAdd(data)
+        event = getEvents(IObjectModifiedEvent)[-1]
+        self.assertEqual(event.descriptions[0].attributes,
+                         ('extra1', 'name', 'address', 'extra2'))
+
+        # the event is sent even if no field was set after adding
+        view.describe_all_fields = False
+        for name in ('name', 'extra1', 'extra2'):
+            del data[name]
+        view.createAndAdd(data)
+        self.assertEqual(len(getEvents(IObjectModifiedEvent)), 3)
+        event = getEvents(IObjectModifiedEvent)[-1]
+        self.assertEqual(event.descriptions, ())
+
+    def test_json(self):
+        import json
+        from cStringIO import StringIO
+
+        class Adding(object):
+
+            implements(IAdding)
+
+            def add(self, ob):
+                self.ob = ob
+                return ob
+
+            def nextURL(self):
+                return 'next'
+
+        class JSONV(V):
+            accept_json = True
+
+        adding = Adding()
+        self._invoke_add(class_=JSONV)
+        (descriminator, callable, args, kw) = self._context.last_action
+        factory = AddViewFactory(*args)
+        data = dict([(name, value)
+                     for (name, value) in SampleData.__dict__.items()
+                     if not name.startswith('_')])
+        request = TestRequest(StringIO(json.dumps(data)), environ={
+            'REQUEST_METHOD': 'POST', 'CONTENT_TYPE': 'application/json'})
+        view = getMultiAdapter((adding, request), name='addthis')
+        result = json.loads(view())
+        self.assertEqual(result, {'status': 'ok', 'errors': {},
+                                  'nextURL': 'next'})
+        self.assertEqual(adding.ob.args, ('bar', 'baz'))
+        self.assertEqual(adding.ob.extra1, 'extra1')
+        self.assertEqual(len(getEvents(IObjectCreatedEvent)), 1)
+        self.failIf('name_widget' in view.__dict__)
+
+        del data['first']
+        request = TestRequest(StringIO(json.dumps(data)), environ={
+            'REQUEST_METHOD': 'POST', 'CONTENT_TYPE': 'application/json'})
+        view = getMultiAdapter((adding, request), name='addthis')
+        result = json.loads(view())
+        self.assertEqual(result['status'], 'error')
+        self.assertEqual(result['errors'].keys(), ['first'])
+        self.assertEqual(len(getEvents(IObjectCreatedEvent)), 1)
+
+    def test_inline_edit(self):
+        # add forms are always submitted as a whole
+        class Adding(object):
+            implements(IAdding)
+
+        class InlineV(V):
+            inline_edit = True
+
+        self._invoke_add(class_=InlineV)
+        (descriminator, callable, args, kw) = self._context.last_action
+        factory = AddViewFactory(*args)
+        request = TestRequest(environ={'REQUEST_METHOD': 'POST'})
+        request.form[Update] = ''
+        request.form[UpdateField] = 'first'
+        view = getMultiAdapter((Adding(), request), name='addthis')
+        self.assertEqual(view.inline_field, None)
+        self.assertEqual(len(view.fieldNames), 8)
+
+    def test_createAndAddAll(self):
+
+        class Adding(object):
+
+            implements(IAdding)
+
+            def __init__(self):
+                self.added = []
+
+            def add(self, ob):
+                self.added.append(ob)
+                return ob
+
+        adding = Adding()
+        self._invoke_add()
+        (descriminator, callable, args, kw) = self._context.last_action
+        factory = AddViewFactory(*args)
+        view = getMultiAdapter((adding, TestRequest()), name='addthis')
+
+        def rows():
+            for i in range(5):
+                data = dict([(name, value) for (name, value)
+                             in SampleData.__dict__.items()
+                             if not name.startswith('_')])
+                data['name'] = u'name %d' % i
+                if i == 1:
+                    del data['first']
+                if i == 3:
+                    data['extra1'] = 42
+                yield data
+
+        errors = view.createAndAddAll(rows(), chunk_size=2)
+        self.assertEqual([ob.name for ob in adding.added],
+                         [u'name 0', u'name 2', u'name 4'])
+        self.assertEqual([index for index, error in errors], [1, 3])
+        self.assertEqual([[e.field_name for e in error]
+                          for index, error in errors],
+                         [['first'], ['extra1']])
+        self.assertEqual(len(getEvents(IObjectCreatedEvent)), 3)
+
+        # unknown keys are errors
+        data = dict([(name, value) for (name, value)
+                     in SampleData.__dict__.items()
+                     if not name.startswith('_')])
+        data['bogus'] = u'bogus'
+        [(index, error)] = view.createAndAddAll([data])
+        self.assertEqual([e.field_name for e in error], ['bogus'])
+
+        # views may create the objects without a content factory
+        class OwnCreate(V, AddView):
+            schema = I
+            fieldNames = ['name']
+            _arguments = _keyword_arguments = _set_before_add = ()
+            _set_after_add = ('name',)
+            def create(self):
+                return C()
+        view = OwnCreate(adding, TestRequest())
+        self.assertEqual(view.createAndAddAll([{'name': u'own'}]), [])
+        self.assertEqual(adding.added[-1].name, u'own')
+
+        # rows can't be rolled back without savepoint support
+        import transaction
+
+        class DataManager(object):
+            def abort(self, txn):
+                pass
+            def sortKey(self):
+                return 'dm'
+
+        transaction.get().join(DataManager())
+        del data['bogus']
+        del data['first']
+        self.assertRaises(WidgetsError, view.createAndAddAll, [data])
+        self.assertRaises(Exception, transaction.commit)
+        transaction.abort()
+
     def test_createAndAdd_w_adapter(self):
 
         class Adding(object):
@@ -0,0 +1,202 @@
+##############################################################################
+#
+# Copyright (c) 2010 Zope Foundation and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""Conditional GET Tests
+
+$Id$
+"""
+import unittest
+
+from persistent import Persistent
+from zope.component.testing import PlacelessSetup
+from zope.interface import Interface, implements
+from zope.publisher.browser import TestRequest
+from zope.schema import TextLine
+from zope.schema.interfaces import ITextLine
+
+from zope.app.testing import ztapi
+
+from zope.formlib.interfaces import IDisplayWidget, IInputWidget
+from zope.formlib.widget import DisplayWidget
+from zope.app.form.browser import TextWidget
+from zope.app.form.browser.interfaces import IModificationStamp
+from zope.app.form.browser.conditional import modificationStamp
+from zope.app.form.browser.conditional import isNotModified
+from zope.app.form.browser.conditional import getValidators
+from zope.app.form.browser.editview import EditView
+from zope.app.form.browser.schemadisplay import DisplayView
+
+class I(Interface):
+    foo = TextLine(title=u"Foo")
+
+class C(object):
+    implements(I)
+    foo = u"c foo"
+    stamp = '1'
+
+class P(Persistent):
+    implements(I)
+    foo = u"p foo"
+
+class IOther(Interface):
+    foo = TextLine(title=u"Foo")
+
+class Other(object):
+    implements(IOther)
+
+    def __init__(self, context):
+        self.foo = context.foo
+
+class Stamp(object):
+    implements(IModificationStamp)
+
+    def __init__(self, context):
+        self.stamp = context.stamp
+        self.modified = 784111777
+
+class Page(object):
+    # stands in for the template of a generated view class
+    def __call__(self):
+        return u'|'.join([widget() for widget in self.widgets()])
+
+class V(DisplayView, Page):
+    schema = I
+    conditional_get = True
+
+class EV(EditView, Page):
+    schema = I
+    conditional_get = True
+
+class Test(PlacelessSetup, unittest.TestCase):
+
+    def setUp(self):
+        super(Test, self).setUp()
+        ztapi.browserViewProviding(ITextLine, DisplayWidget, IDisplayWidget)
+        ztapi.browserViewProviding(ITextLine, TextWidget, IInputWidget)
+        ztapi.provideAdapter(I, IModificationStamp, Stamp)
+
+    def test_modificationStamp(self):
+        c = C()
+        self.assertEqual(modificationStamp(c), ('1', 784111777))
+        c.stamp = None
+        self.assertEqual(modificationStamp(c), None)
+        p = P()
+        ztapi.provideAdapter(I, IModificationStamp, None)
+        self.assertEqual(modificationStamp(p), None)
+        p._p_serial = '\0\0\0\0\0\0\0\1'
+        self.assertEqual(modificationStamp(p)[0], '0000000000000001')
+
+    def test_display(self):
+        c = C()
+        request = TestRequest()
+        self.assertEqual(V(c, request)(), u'c foo')
+        response = request.response
+        etag = response.getHeader('ETag')
+        self.failUnless(etag.startswith('"'))
+        self.assertEqual(response.getHeader('Last-Modified'),
+                         'Sun, 06 Nov 1994 08:49:37 GMT')
+
+        request = TestRequest(environ={'HTTP_IF_NONE_MATCH': etag})
+        view = V(c, request)
+        self.failUnless(view.not_modified)
+        self.failIf('foo_widget' in view.__dict__)
+        self.assertEqual(view(), u'')
+        self.assertEqual(request.response.getStatus(), 304)
+        self.assertEqual(request.response.getHeader('ETag'), etag)
+
+        # the page changes with the object
+        c.stamp = '2'
+        request = TestRequest(environ={'HTTP_IF_NONE_MATCH': etag})
+        self.assertEqual(V(c, request)(), u'c foo')
+        self.assertNotEqual(request.response.getHeader('ETag'), etag)
+
+    def test_private(self):
+        request = TestRequest()
+        V(C(), request)()
+        self.assertEqual(request.response.getHeader('Cache-Control'),
+                         'private')
+        self.assertEqual(request.response.getHeader('Vary'),
+                         'Cookie, Authorization')
+
+    def test_adapted_schema(self):
+        p = P()
+        p._p_serial = '\0\0\0\0\0\0\0\1'
+        ztapi.provideAdapter(I, IModificationStamp, None)
+        ztapi.provideAdapter(I, IOther, Other)
+        self.failIf(getValidators(V(p, TestRequest())) is None)
+        # the serial of the context doesn't tell when adapted data changes
+        class OtherV(V):
+            schema = IOther
+        view = OtherV(p, TestRequest())
+        self.assertEqual(view.validators, None)
+        self.assertEqual(view(), u'p foo')
+        # unless there is a modification stamp adapter
+        ztapi.provideAdapter(I, IModificationStamp, Stamp)
+        p.stamp = '1'
+        self.failIf(OtherV(p, TestRequest()).validators is None)
+
+    def test_if_modified_since(self):
+        c = C()
+        request = TestRequest(environ={
+            'HTTP_IF_MODIFIED_SINCE': 'Sun, 06 Nov 1994 08:49:37 GMT'})
+        self.assertEqual(V(c, request)(), u'')
+        self.assertEqual(request.response.getStatus(), 304)
+        request = TestRequest(environ={
+            'HTTP_IF_MODIFIED_SINCE': 'Sat, 05 Nov 1994 08:49:37 GMT'})
+        self.assertEqual(V(c, request)(), u'c foo')
+        # If-None-Match takes precedence
+        request = TestRequest(environ={
+            'HTTP_IF_MODIFIED_SINCE': 'Sun, 06 Nov 1994 08:49:37 GMT',
+            'HTTP_IF_NONE_MATCH': '"other"'})
+        self.assertEqual(V(c, request)(), u'c foo')
+
+    def test_any_etag(self):
+        c = C()
+        request = TestRequest(environ={'HTTP_IF_NONE_MATCH': '*'})
+        self.assertEqual(V(c, request)(), u'')
+        self.assertEqual(request.response.getStatus(), 304)
+        # without an entity tag the page is always rendered
+        c.stamp = None
+        request = TestRequest(environ={'HTTP_IF_NONE_MATCH': '*'})
+        self.assertEqual(V(c, request)(), u'c foo')
+        self.failIf(isNotModified(request, None))
+
+    def test_edit(self):
+        c = C()
+        request = TestRequest()
+        EV(c, request)()
+        etag = request.response.getHeader('ETag')
+        request = TestRequest(environ={'HTTP_IF_NONE_MATCH': etag})
+        view = EV(c, request)
+        self.assertEqual(view(), u'')
+        self.assertEqual(request.response.getStatus(), 304)
+        # the view can still be used
+        self.assertEqual(view.update(), '')
+        self.assertEqual(view.adapted, c)
+        self.assertEqual(view.widgets()[0].name, 'field.foo')
+        # edit and display pages have different tags
+        request = TestRequest(environ={'HTTP_IF_NONE_MATCH': etag})
+        self.failIf(V(c, request).not_modified)
+        # requests with form data are not conditional
+        request = TestRequest(form={'field.foo': u'r foo'},
+                              environ={'HTTP_IF_NONE_MATCH': etag})
+        view = EV(c, request)
+        self.assertEqual(view.validators, None)
+        view()
+        self.assertEqual(request.response.getHeader('ETag'), None)
+
+def test_suite():
+    return unittest.makeSuite(Test)
+
+if __name__=='__main__':
+    unittest.main(defaultTest='test_suite')
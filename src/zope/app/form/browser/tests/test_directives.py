@@ -23,6 +23,7 @@ from zope.component.testing import PlacelessSetup
 from zope.configuration.xmlconfig import xmlconfig, XMLConfig
 from zope.traversing.interfaces import TraversalError
 from zope.interface import Interface, implements
+from zope.interface.common.mapping import IEnumerableMapping
 from zope.publisher.browser import TestRequest
 from zope.schema import TextLine, Int
 
@@ -54,6 +55,9 @@ class Ob(object):
 unwrapped_ob = Ob()
 ob = utils.securityWrap(unwrapped_ob, IC)
 
+class Items(dict):
+    implements(IEnumerableMapping)
+
 class ISomeWidget(Interface):
     displayWidth = Int(
         title=u"Display Width",
@@ -129,6 +133,80 @@ class Test(PlacelessSetup, unittest.TestCase):
             """)))
 
         v = component.getMultiAdapter((ob, request), name='edit.html')
+        self.failIf(v.redirect_after_post)
+        # expect to fail as standard macros are not configured
+        self.assertRaises(TraversalError, v)
+
+    def testEditFormsShareTemplates(self):
+        xmlconfig(StringIO(template % ("""
+          <view
+              type="zope.publisher.interfaces.browser.IBrowserRequest"
+              for="zope.schema.interfaces.ITextLine"
+              provides="zope.formlib.interfaces.IInputWidget"
+              factory="zope.app.form.browser.TextWidget"
+              permission="zope.Public"
+              />
+
+          <browser:editform
+              for="zope.app.form.browser.tests.test_directives.IC"
+              schema="zope.app.form.browser.tests.test_directives.Schema"
+              name="edit.html"
+              permission="zope.Public" />
+
+          <browser:editform
+              for="zope.app.form.browser.tests.test_directives.IC"
+              schema="zope.app.form.browser.tests.test_directives.Schema"
+              name="edit2.html"
+              permission="zope.Public" />
+            """)))
+
+        class1 = type(component.getMultiAdapter((ob, request),
+                                                name='edit.html'))
+        class2 = type(component.getMultiAdapter((ob, request),
+                                                name='edit2.html'))
+        self.failIf(class1 is class2)
+        self.failUnless(class1.__dict__['index'] is class2.__dict__['index'])
+        self.failUnless(class1.__dict__['generated_form']
+                        is class2.__dict__['generated_form'])
+
+    def testDeferredEditForm(self):
+        from zope.publisher.interfaces.browser import IDefaultBrowserLayer
+        from zope.app.form.browser.deferred import DeferredViewFactory
+        xmlconfig(StringIO(template % ("""
+          <view
+              type="zope.publisher.interfaces.browser.IBrowserRequest"
+              for="zope.schema.interfaces.ITextLine"
+              provides="zope.formlib.interfaces.IInputWidget"
+              factory="zope.app.form.browser.TextWidget"
+              permission="zope.Public"
+              />
+
+          <browser:editform
+              for="zope.app.form.browser.tests.test_directives.IC"
+              schema="zope.app.form.browser.tests.test_directives.Schema"
+              name="edit.html"
+              label="Edit a ZPT page"
+              fields="text"
+              permission="zope.Public"
+              redirect_after_post="true"
+              conditional_get="true"
+              deferred="true" />
+            """)))
+
+        factory = component.getSiteManager().adapters.lookup(
+            (IC, IDefaultBrowserLayer), Interface, 'edit.html')
+        self.failUnless(isinstance(factory, DeferredViewFactory))
+        self.failIf(factory.isGenerated())
+
+        v = component.getMultiAdapter((ob, request), name='edit.html')
+        self.failUnless(factory.isGenerated())
+        self.assertEqual(v.label, 'Edit a ZPT page')
+        self.assertEqual(v.fieldNames, ['text'])
+        self.failUnless(v.redirect_after_post)
+        self.failUnless(v.conditional_get)
+        self.failUnless(type(v) is factory.viewClass())
+        v2 = component.getMultiAdapter((ob, request), name='edit.html')
+        self.failUnless(type(v2) is type(v))
         # expect to fail as standard macros are not configured
         self.assertRaises(TraversalError, v)
 
@@ -187,6 +265,52 @@ class Test(PlacelessSetup, unittest.TestCase):
         # expect to fail as standard macros are not configured
         self.assertRaises(TraversalError, v)
 
+    def testGridEditForm(self):
+        from zope.app.form.browser.gridedit import GridEditView
+        self.assertEqual(
+            component.queryMultiAdapter((ob, request), name='grid.html'),
+            None)
+        xmlconfig(StringIO(template % ("""
+          <browser:grideditform
+              for="zope.app.form.browser.tests.test_directives.IC"
+              schema="zope.app.form.browser.tests.test_directives.Schema"
+              name="grid.html"
+              label="Edit the items"
+              fields="text"
+              batch_size="5"
+              permission="zope.Public">
+            <browser:widget
+                field="text"
+                class="zope.app.form.browser.tests.test_directives.SomeWidget"
+                displayWidth="30"
+                />
+          </browser:grideditform>
+            """)))
+
+        v = component.getMultiAdapter((ob, request), name='grid.html')
+        self.failUnless(isinstance(v, GridEditView))
+        self.assertEqual(v.schema, Schema)
+        self.assertEqual(v.fieldNames, ['text'])
+        self.assertEqual(v.batch_size, 5)
+        self.assertEqual(v.label, u'Edit the items')
+        widget = v.text_widget(Schema['text'], request)
+        self.failUnless(isinstance(widget, SomeWidget))
+        self.assertEqual(widget.displayWidth, 30)
+
+    def testGridEditFormForContainers(self):
+        xmlconfig(StringIO(template % ("""
+          <browser:grideditform
+              schema="zope.app.form.browser.tests.test_directives.Schema"
+              name="grid.html"
+              permission="zope.Public" />
+            """)))
+
+        self.assertEqual(
+            component.queryMultiAdapter((ob, request), name='grid.html'),
+            None)
+        v = component.getMultiAdapter((Items(), request), name='grid.html')
+        self.assertEqual(v.schema, Schema)
+
     def testAddFormWithWidget(self):
         self.assertEqual(
             component.queryMultiAdapter((ob, request), name='add.html'),
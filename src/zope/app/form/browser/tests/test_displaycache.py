@@ -0,0 +1,144 @@
+##############################################################################
+#
+# Copyright (c) 2010 Zope Foundation and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""Display Cache Tests
+
+$Id$
+"""
+import unittest
+
+from zope.component.testing import PlacelessSetup
+from zope.interface import Interface, implements
+from zope.lifecycleevent import ObjectModifiedEvent
+from zope.publisher.browser import TestRequest
+from zope.schema import TextLine
+from zope.schema.interfaces import ITextLine
+
+from zope.app.testing import ztapi
+
+from zope.formlib.interfaces import IDisplayWidget
+from zope.formlib.widget import DisplayWidget
+from zope.app.form.browser.displaycache import DisplayCache
+from zope.app.form.browser.displaycache import invalidateDisplayCaches
+from zope.app.form.browser.schemadisplay import DisplayView
+
+class I(Interface):
+    foo = TextLine(title=u"Foo")
+    bar = TextLine(title=u"Bar")
+
+class C(object):
+    implements(I)
+    foo = u"c foo"
+    bar = u"c bar"
+
+class Page(object):
+    # stands in for the template of a generated view class
+    renderings = 0
+
+    def __call__(self):
+        Page.renderings += 1
+        return u'|'.join([widget() for widget in self.widgets()])
+
+class V(DisplayView, Page):
+    schema = I
+    output_cache = DisplayCache(size=2)
+
+class Test(PlacelessSetup, unittest.TestCase):
+
+    def setUp(self):
+        super(Test, self).setUp()
+        ztapi.browserViewProviding(ITextLine, DisplayWidget, IDisplayWidget)
+        V.output_cache.clear()
+        Page.renderings = 0
+
+    def test_cache(self):
+        cache = DisplayCache(size=2)
+        a, b, c = C(), C(), C()
+        cache.set((('id', id(a)), 1), 'a', a)
+        cache.set((('id', id(b)), 1), 'b', b)
+        self.assertEqual(cache.query((('id', id(a)), 1)), 'a')
+        cache.set((('id', id(c)), 1), 'c', c)
+        # b was the least recently used entry
+        self.assertEqual(cache.query((('id', id(b)), 1)), None)
+        self.assertEqual(cache.query((('id', id(c)), 1)), 'c')
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.hits, 2)
+        self.assertEqual(cache.misses, 1)
+        cache.invalidate(a)
+        self.assertEqual(cache.query((('id', id(a)), 1)), None)
+        self.assertEqual(cache.statistics(),
+                         {'size': 1, 'maxsize': 2, 'ttl': 300,
+                          'hits': 2, 'misses': 2})
+
+    def test_ttl(self):
+        self.assertEqual(DisplayCache().ttl, 300)
+        cache = DisplayCache(ttl=60)
+        a = C()
+        cache.set((('id', id(a)),), 'a', a)
+        self.assertEqual(cache.query((('id', id(a)),)), 'a')
+        cache.ttl = -1
+        cache.set((('id', id(a)),), 'a', a)
+        self.assertEqual(cache.query((('id', id(a)),)), None)
+        self.assertEqual(len(cache), 0)
+
+    def test_view(self):
+        c = C()
+        self.assertEqual(V(c, TestRequest())(), u'c foo|c bar')
+        # widgets are not set up for cached pages
+        view = V(c, TestRequest())
+        self.assertEqual(view(), u'c foo|c bar')
+        self.failIf('foo_widget' in view.__dict__)
+        self.assertEqual(Page.renderings, 1)
+        self.assertEqual(V.output_cache.hits, 1)
+
+        # form data disables the cache
+        self.assertEqual(V(c, TestRequest(form={'x': 'y'}))(),
+                         u'c foo|c bar')
+        self.assertEqual(Page.renderings, 2)
+
+        # pages are cached per URL, which includes the virtual host
+        self.assertEqual(V(c, TestRequest(SERVER_URL='http://other:8080'))(),
+                         u'c foo|c bar')
+        self.assertEqual(Page.renderings, 3)
+
+    def test_adapted_schema(self):
+        class IOther(Interface):
+            foo = TextLine(title=u"Foo")
+        class Other(object):
+            implements(IOther)
+            def __init__(self, context):
+                self.foo = context.foo
+        ztapi.provideAdapter(I, IOther, Other)
+        class OtherV(V):
+            schema = IOther
+        c = C()
+        OtherV(c, TestRequest())()
+        self.assertEqual(OtherV(c, TestRequest())(), u'c foo')
+        # the output of views of adapted schemas is not cached
+        self.assertEqual(Page.renderings, 2)
+        self.assertEqual(len(V.output_cache), 0)
+
+    def test_invalidation(self):
+        c = C()
+        V(c, TestRequest())()
+        c.foo = u'new foo'
+        self.assertEqual(V(c, TestRequest())(), u'c foo|c bar')
+        invalidateDisplayCaches(ObjectModifiedEvent(c))
+        self.assertEqual(V(c, TestRequest())(), u'new foo|c bar')
+        self.assertEqual(Page.renderings, 2)
+
+def test_suite():
+    return unittest.makeSuite(Test)
+
+if __name__=='__main__':
+    unittest.main(defaultTest='test_suite')
@@ -15,9 +15,12 @@
 
 $Id$
 """
+import json
 import unittest
+from cStringIO import StringIO
 
 from zope.component.eventtesting import getEvents, clearEvents
+from zope.lifecycleevent.interfaces import IObjectModifiedEvent
 from zope.component.testing import PlacelessSetup
 from zope.interface import Interface, implements
 from zope.location.interfaces import ILocation
@@ -29,8 +32,11 @@ from zope.app.testing import ztapi
 
 from zope.app.form.browser import TextWidget
 from zope.app.form.browser.editview import EditView
-from zope.app.form.browser.submit import Update
+from zope.app.form.browser.submit import Update, UpdateField
 from zope.formlib.interfaces import IInputWidget
+from zope.formlib.interfaces import IWidgetInputError
+from zope.formlib.interfaces import IWidgetInputErrorView
+from zope.formlib.exception import WidgetInputErrorView
 from zope.app.form.tests import utils
 
 class I(Interface):
@@ -100,6 +106,23 @@ class BarV(EditView):
     schema = IBar
     object_factories = []
 
+class LazyEV(EV):
+    lazy_widgets = True
+
+class EagerEV(LazyEV):
+    lazy_widgets = False
+
+class JSONEV(EV):
+    accept_json = True
+
+class InlineEV(EV):
+    inline_edit = True
+
+def JSONRequest(body):
+    return TestRequest(StringIO(body), environ={
+        'REQUEST_METHOD': 'POST',
+        'CONTENT_TYPE': 'application/json; charset=utf-8'})
+
 class Test(PlacelessSetup, unittest.TestCase):
 
     def setUp(self):
@@ -180,6 +203,236 @@ class Test(PlacelessSetup, unittest.TestCase):
         self.assertEqual(c.b  , u'c b')
         self.assertEqual(c.getbaz(), u'c baz')
 
+    def test_update_describes_changed_fields(self):
+        from zope.component.eventtesting import setUp
+        setUp()
+        c = C()
+        request = TestRequest()
+        request.form[Update] = ''
+        request.form['field.foo'] = u'r foo'
+        request.form['field.bar'] = u'c bar'
+        request.form['field.getbaz'] = u'r baz'
+        v = EV(c, request)
+        v.update()
+        [event] = getEvents(IObjectModifiedEvent)
+        self.assertEqual(event.descriptions[0].interface, I)
+        self.assertEqual(event.descriptions[0].attributes, ('foo', 'getbaz'))
+
+        clearEvents()
+        v = EV(C(), request)
+        v.describe_all_fields = True
+        v.update()
+        [event] = getEvents(IObjectModifiedEvent)
+        self.assertEqual(event.descriptions[0].attributes,
+                         ('foo', 'bar', 'a', 'b', 'getbaz'))
+
+    def test_json_update(self):
+        from zope.component.eventtesting import setUp
+        setUp()
+        c = C()
+        request = JSONRequest(
+            '{"foo": "r foo", "bar": "c bar", "getbaz": "r baz"}')
+        v = JSONEV(c, request)
+        result = json.loads(v())
+        self.assertEqual(result, {'status': 'ok', 'errors': {},
+                                  'changed': ['foo', 'getbaz']})
+        self.assertEqual(request.response.getHeader('Content-Type'),
+                         'application/json')
+        self.assertEqual((c.foo, c.bar, c.getbaz()),
+                         (u'r foo', u'c bar', u'r baz'))
+        self.failUnless(v.update().startswith('Updated '))
+        # no widgets were set up
+        self.failIf('foo_widget' in v.__dict__)
+        [event] = getEvents(IObjectModifiedEvent)
+        self.assertEqual(event.descriptions[0].attributes, ('foo', 'getbaz'))
+
+        # other requests are handled by the widgets
+        v = JSONEV(c, TestRequest())
+        self.failUnless('foo_widget' in v.__dict__)
+        self.failIf(v.json_request)
+
+    def test_json_update_errors(self):
+        c = C()
+        request = JSONRequest('{"foo": 1, "bar": "r bar", "other": 1}')
+        result = json.loads(JSONEV(c, request)())
+        self.assertEqual(result['status'], 'error')
+        self.assertEqual(sorted(result['errors']), ['foo', 'other'])
+        self.assertEqual(request.response.getStatus(), 400)
+        # nothing was changed
+        self.assertEqual(c.bar, u'c bar')
+
+        request = JSONRequest('["foo"]')
+        result = json.loads(JSONEV(c, request)())
+        self.assertEqual(result['errors'].keys(), [''])
+        import transaction
+        transaction.abort()
+
+    def test_json_charset(self):
+        c = C()
+        request = TestRequest(StringIO('{"foo": "r foo"}'), environ={
+            'REQUEST_METHOD': 'POST',
+            'CONTENT_TYPE': 'application/json; charset=bogus'})
+        result = json.loads(JSONEV(c, request)())
+        self.assertEqual(result['errors'].keys(), [''])
+        self.assertEqual(request.response.getStatus(), 400)
+        self.assertEqual(c.foo, u'c foo')
+        import transaction
+        transaction.abort()
+
+    def test_json_unwritable(self):
+        from zope.security.checker import Proxy
+        c = C()
+        checker = utils.SchemaChecker(I)
+        checker.setnames['bar'] = False
+        request = JSONRequest('{"foo": "r foo", "bar": "r bar"}')
+        result = json.loads(JSONEV(Proxy(c, checker), request)())
+        self.assertEqual(result['errors'].keys(), ['bar'])
+        # no field was changed
+        self.assertEqual((c.foo, c.bar), (u'c foo', u'c bar'))
+        import transaction
+        transaction.abort()
+
+    def test_convertJSONValue(self):
+        from datetime import date
+        from zope.schema import Float, Date, Datetime, Tuple, Set, Int
+        from zope.app.form.browser.headless import convertJSONValue
+        self.assertEqual(convertJSONValue(Float(), 1), 1.0)
+        self.assertEqual(type(convertJSONValue(Float(), 1)), float)
+        self.assertEqual(convertJSONValue(Int(), u'2'), 2)
+        self.assertEqual(convertJSONValue(Date(), u'2010-02-03'),
+                         date(2010, 2, 3))
+        value = convertJSONValue(Datetime(), u'2010-02-03T04:05:06Z')
+        self.assertEqual((value.date(), value.hour), (date(2010, 2, 3), 4))
+        self.assertRaises(ValueError, convertJSONValue, Date(), u'never')
+        self.assertEqual(
+            convertJSONValue(Tuple(value_type=Float()), [1, u'2.5']),
+            (1.0, 2.5))
+        self.assertEqual(convertJSONValue(Set(), [1, 2, 1]), set([1, 2]))
+        self.assertRaises(ValueError, convertJSONValue, Set(), [[1]])
+
+    def test_inline_update(self):
+        from zope.component.eventtesting import setUp
+        setUp()
+        c = C()
+        request = TestRequest(environ={'REQUEST_METHOD': 'POST'})
+        request.form[Update] = ''
+        request.form[UpdateField] = 'getbaz'
+        request.form['field.getbaz'] = u'r baz'
+        # the input of other fields is ignored
+        request.form['field.foo'] = u'r foo'
+        v = InlineEV(c, request)
+        self.assertEqual(v.inline_field, 'getbaz')
+        self.failIf('foo_widget' in v.__dict__)
+        self.assertEqual([w.name for w in v.widgets()], ['field.getbaz'])
+        result = v()
+        self.failUnless('name="field.getbaz"' in result, result)
+        self.failUnless('value="r baz"' in result, result)
+        self.assertEqual((c.getbaz(), c.foo), (u'r baz', u'c foo'))
+        [event] = getEvents(IObjectModifiedEvent)
+        self.assertEqual(event.descriptions[0].attributes, ('getbaz',))
+
+        # unknown fields are ignored
+        request = TestRequest(environ={'REQUEST_METHOD': 'POST'})
+        request.form[Update] = ''
+        request.form[UpdateField] = 'other'
+        v = InlineEV(c, request)
+        self.assertEqual(v.inline_field, None)
+        self.failUnless('foo_widget' in v.__dict__)
+
+    def test_inline_update_needs_post(self):
+        c = C()
+        for request in (TestRequest(), TestRequest(
+                environ={'REQUEST_METHOD': 'POST'})):
+            request.form[UpdateField] = 'foo'
+            request.form['field.foo'] = u'r foo'
+            v = InlineEV(c, request)
+            self.assertEqual(v.inline_field, None)
+            v.update()
+            self.assertEqual(c.foo, u'c foo')
+        # views don't update single fields by default
+        request = TestRequest(environ={'REQUEST_METHOD': 'POST'})
+        request.form[Update] = ''
+        request.form[UpdateField] = 'foo'
+        self.assertEqual(EV(c, request).inline_field, None)
+
+    def test_inline_update_error(self):
+        c = C()
+        request = TestRequest(environ={'REQUEST_METHOD': 'POST'})
+        request.form[Update] = ''
+        request.form[UpdateField] = 'foo'
+        request.form['field.foo'] = u''
+        ztapi.browserViewProviding(IWidgetInputError, WidgetInputErrorView,
+                                   IWidgetInputErrorView)
+        v = InlineEV(c, request)
+        self.assertEqual(
+            v(), u'<span class="error">Required input is missing.</span>')
+        self.assertEqual(request.response.getStatus(), 400)
+        self.assertEqual(c.foo, u'c foo')
+        import transaction
+        transaction.abort()
+
+    def test_redirect_after_post(self):
+        c = C()
+        request = TestRequest()
+        request.form[Update] = ''
+        request.form['field.foo'] = u'r foo'
+        v = EV(c, request)
+        v.redirect_after_post = True
+        self.assertEqual(v(), u'')
+        self.failUnless(v.redirected)
+        self.assertEqual(c.foo, u'r foo')
+        self.assertEqual(request.response.getStatus(), 303)
+        self.assertEqual(request.response.getHeader('Location'),
+                         'http://127.0.0.1')
+        # the widgets were not refreshed with the new values
+        self.assertNotEqual(v.foo_widget._data, u'r foo')
+        cookie = request.response.getCookie('zope.app.form.status')
+        self.failUnless(cookie['value'].startswith('Updated%20on%20'))
+
+        # the following request shows the status
+        request = TestRequest(environ={
+            'HTTP_COOKIE': 'zope.app.form.status=' + cookie['value']})
+        v = EV(c, request)
+        v.redirect_after_post = True
+        self.failUnless(v.update().startswith(u'Updated on '))
+
+        # forms with errors are not redirected
+        request = TestRequest()
+        request.form[Update] = ''
+        request.form['field.foo'] = u''
+        v = EV(c, request)
+        v.redirect_after_post = True
+        self.assertEqual(v.update(), u'An error occurred.')
+        self.failIf(v.redirected)
+        self.assertEqual(request.response.getStatus(), 599)
+        import transaction
+        transaction.abort()
+
+    def test_update_refreshes_changed_widgets(self):
+        c = C()
+        request = TestRequest()
+        request.form[Update] = ''
+        request.form['field.foo'] = u'r foo'
+        request.form['field.bar'] = u'c bar'
+        v = EV(c, request)
+        v.incremental_refresh = True
+        # values changed behind the form's back are not shown for fields
+        # that were not changed by the form
+        c.foo = c.bar = c.a = u'other'
+        message = v.update()
+        self.failUnless(message.startswith('Updated '), message)
+        self.assertEqual(c.foo, u'r foo')
+        self.assertEqual(c.bar, u'c bar')
+        self.assertEqual(v.foo_widget._getFormValue(), u'r foo')
+        self.assertEqual(v.a_widget._getFormValue(), u'c a')
+
+        # by default all widgets are refreshed
+        c = C()
+        v = EV(c, request)
+        c.a = u'other'
+        v.update()
+        self.assertEqual(v.a_widget._getFormValue(), u'other')
+
     def test_update_via_adapter(self):
         f = Foo()
         request = TestRequest()
@@ -197,6 +450,46 @@ class Test(PlacelessSetup, unittest.TestCase):
         # wrong update
         self.failIf(getEvents())
 
+    def test_lazy_widgets(self):
+        v = LazyEV(C(), TestRequest())
+        self.failIf('foo_widget' in v.__dict__)
+        self.assertEqual(v.foo_widget.name, 'field.foo')
+        self.assertEqual(v.foo_widget._getFormValue(), u'c foo')
+        self.failUnless(v.foo_widget is v.foo_widget)
+        self.failIf('bar_widget' in v.__dict__)
+        v.setPrefix("test")
+        self.assertEqual(
+            [w.name for w in v.widgets()],
+            ['test.foo', 'test.bar', 'test.a', 'test.b', 'test.getbaz']
+            )
+
+    def test_lazy_widgets_installed_once(self):
+        LazyEV(C(), TestRequest())
+        descriptor = LazyEV.__dict__['foo_widget']
+        v = LazyEV(C(), TestRequest())
+        self.failUnless(LazyEV.__dict__['foo_widget'] is descriptor)
+        self.assertEqual(v.foo_widget._getFormValue(), u'c foo')
+        # subclasses setting up their widgets at once are not affected
+        v = EagerEV(C(), TestRequest())
+        self.failUnless('foo_widget' in v.__dict__)
+        self.failIf('foo_widget' in EagerEV.__dict__)
+        self.assertEqual(v.foo_widget._getFormValue(), u'c foo')
+
+    def test_lazy_widgets_update(self):
+        c = C()
+        request = TestRequest()
+        v = LazyEV(c, request)
+        request.form[Update] = ''
+        request.form['field.foo'] = u'r foo'
+        request.form['field.bar'] = u'r bar'
+        request.form['field.a'] = u'c a'
+        request.form['field.getbaz'] = u'r baz'
+        message = v.update()
+        self.failUnless(message.startswith('Updated '), message)
+        self.assertEqual(c.foo, u'r foo')
+        self.assertEqual(c.getbaz(), u'r baz')
+        self.assertEqual(c.b, u'c b')
+
     def test_setUpWidget_via_conform_adapter(self):
         
         f = ConformFoo()
@@ -15,9 +15,12 @@
 
 $Id$
 """
+import pickle
 import unittest
 import doctest
 
+from zope.interface import Interface
+from zope.schema import TextLine
 from zope.schema.interfaces import ITextLine
 from zope.component import testing
 
@@ -25,14 +28,79 @@ from zope.app.testing import ztapi
 
 from zope.app.form.browser import TextWidget
 from zope.formlib.interfaces import IInputWidget
+from zope.app.form.browser.formview import Data
 
 def setUp(test):
     testing.setUp()
     ztapi.browserViewProviding(ITextLine, TextWidget, IInputWidget)
 
 
+class IName(Interface):
+
+    first = TextLine(title=u"First Name")
+    last = TextLine(title=u"Last Name")
+
+
+class DataTest(unittest.TestCase):
+
+    def tearDown(self):
+        testing.tearDown()
+
+    def test_mapping(self):
+        data = Data({'last': u'Doe'}, age=42)
+        self.failUnless(isinstance(data, dict))
+        self.assertEqual(sorted(data.keys()), ['age', 'last'])
+        self.assertEqual(len(data), 2)
+        self.assertEqual(data, {'last': u'Doe', 'age': 42})
+        self.assertEqual(data['last'], u'Doe')
+        self.assertEqual(data.last, u'Doe')
+        self.assertEqual(data.age, 42)
+        self.assertEqual(data.get('first'), None)
+        self.failIf('first' in data)
+        self.assertRaises(KeyError, data.__getitem__, 'first')
+        self.assertRaises(AttributeError, getattr, data, 'first')
+        data.first = u'John'
+        self.assertEqual(data.pop('age'), 42)
+        self.assertEqual(sorted(data.items()),
+                         [('first', u'John'), ('last', u'Doe')])
+
+    def test_load(self):
+        loaded = []
+        def load(name):
+            loaded.append(name)
+            return {'first': u'John'}[name]
+        data = Data(load=load)
+        self.assertEqual(data.keys(), [])
+        # values are only items once loaded
+        self.failIf('first' in data)
+        self.assertEqual(loaded, [])
+        self.assertEqual(data.first, u'John')
+        self.assertEqual(data['first'], u'John')
+        self.assertEqual(data.get('last', 1), 1)
+        self.assertEqual(loaded, ['first', 'last'])
+        self.assertEqual(data.keys(), ['first'])
+        self.failUnless('first' in data)
+
+    def test_copy(self):
+        data = Data({'first': u'John', 'age': 42}, load={'last': u'Doe'}.get)
+        copy = data.copy()
+        self.assertEqual(copy, data)
+        copy.first = u'Jim'
+        self.assertEqual(data.first, u'John')
+        self.assertEqual(copy.copy(['first', 'last']), {'first': u'Jim'})
+        self.assertEqual(copy.copy(['first']).last, u'Doe')
+
+    def test_pickle(self):
+        data = Data({'first': u'John'}, load=lambda name: u'Doe')
+        data = pickle.loads(pickle.dumps(data))
+        self.assertEqual(data, {'first': u'John'})
+        self.assertEqual(data.first, u'John')
+        self.assertEqual(data.get('last'), None)
+
+
 def test_suite():
     return unittest.TestSuite((
+        unittest.makeSuite(DataTest),
         doctest.DocFileSuite('../form.txt',
                              setUp=setUp, tearDown=testing.tearDown,
                              optionflags=doctest.NORMALIZE_WHITESPACE),
@@ -0,0 +1,168 @@
+##############################################################################
+#
+# Copyright (c) 2010 Zope Foundation and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""Grid Edit View Tests
+
+$Id$
+"""
+import unittest
+import transaction
+
+from zope.component.eventtesting import getEvents
+from zope.component.eventtesting import PlacelessSetup as EventPlacelessSetup
+from zope.component.testing import PlacelessSetup
+from zope.lifecycleevent.interfaces import IObjectModifiedEvent
+from zope.publisher.browser import TestRequest
+from zope.schema.interfaces import ITextLine
+from zope.security.checker import Checker, Proxy
+from zope.security.management import setSecurityPolicy
+from zope.security.management import newInteraction, endInteraction
+from zope.security.simplepolicies import ParanoidSecurityPolicy
+
+from zope.app.testing import ztapi
+
+from zope.app.form.browser import TextWidget
+from zope.app.form.browser.gridedit import GridEditView
+from zope.app.form.browser.submit import Update
+from zope.formlib.interfaces import IInputWidget, IDisplayWidget
+from zope.app.form.browser import DisplayWidget
+from zope.app.form.browser.tests.test_editview import I, C
+
+class Container(dict):
+
+    def items(self):
+        return sorted(dict.items(self))
+
+class GV(GridEditView):
+    schema = I
+    fieldNames = ['foo', 'bar']
+    batch_size = 2
+
+checks = []
+
+class Policy(ParanoidSecurityPolicy):
+
+    def checkPermission(self, permission, object):
+        checks.append(permission)
+        return permission != 'manage'
+
+class Principal(object):
+    id = 'bob'
+
+class Participation(object):
+    interaction = None
+    principal = Principal()
+
+class Test(PlacelessSetup, EventPlacelessSetup, unittest.TestCase):
+
+    def setUp(self):
+        PlacelessSetup.setUp(self)
+        EventPlacelessSetup.setUp(self)
+        ztapi.browserViewProviding(ITextLine, TextWidget, IInputWidget)
+        ztapi.browserViewProviding(ITextLine, DisplayWidget, IDisplayWidget)
+        self.container = Container()
+        for key in u'abcde':
+            self.container[key] = C()
+
+    def tearDown(self):
+        # errors doom the transaction
+        transaction.abort()
+        super(Test, self).tearDown()
+
+    def test_rows(self):
+        view = GV(self.container, TestRequest())
+        self.assertEqual(view.update(), '')
+        rows = list(view.rows())
+        self.assertEqual([row.key for row in rows], [u'a', u'b'])
+        self.assertEqual([w.name for w in rows[1].widgets()],
+                         ['row.62.foo', 'row.62.bar'])
+        self.assertEqual(view.titles(), [u'Foo', u'Bar'])
+        self.assertEqual(view.previousURL(), None)
+        self.assertEqual(view.nextURL(),
+                         'http://127.0.0.1?batch_start=2')
+
+        view = GV(self.container, TestRequest(form={'batch_start': '4'}))
+        self.assertEqual([row.key for row in view.rows()], [u'e'])
+        self.assertEqual(view.previousURL(),
+                         'http://127.0.0.1?batch_start=2')
+        self.assertEqual(view.nextURL(), None)
+
+    def test_render_rows(self):
+        view = GV(self.container, TestRequest())
+        chunks = list(view.renderRows())
+        self.assertEqual(len(chunks), 2)
+        self.failUnless(chunks[1].startswith(u'<tr><td><input'))
+        self.failUnless(u'name="row.62.bar"' in chunks[1])
+
+    def test_security_per_class(self):
+        checker = Checker({'foo': 'view', 'bar': 'view'},
+                          {'foo': 'edit', 'bar': 'manage'})
+        container = Container()
+        for key in u'ab':
+            container[key] = Proxy(C(), checker)
+        oldpolicy = setSecurityPolicy(Policy)
+        newInteraction(Participation())
+        try:
+            del checks[:]
+            view = GV(container, TestRequest())
+            rows = list(view.rows())
+            # each write permission is checked once for both rows
+            self.assertEqual(sorted(set(checks)), ['edit', 'manage', 'view'])
+            self.assertEqual(checks.count('edit'), 1)
+            self.assertEqual(checks.count('manage'), 1)
+            for row in rows:
+                self.failUnless(IInputWidget.providedBy(row.foo_widget))
+                self.failIf(IInputWidget.providedBy(row.bar_widget))
+        finally:
+            endInteraction()
+            setSecurityPolicy(oldpolicy)
+
+    def test_update(self):
+        request = TestRequest(form={
+            Update: '', 'batch_start': '2',
+            'row.63.foo': u'c new', 'row.63.bar': u'c bar',
+            'row.64.foo': u'd new', 'row.64.bar': u'd new',
+            # not in the batch
+            'row.61.foo': u'a new'})
+        view = GV(self.container, request)
+        self.assertEqual(view.update(), u'Updated ${count} objects')
+        self.assertEqual(self.container['c'].foo, u'c new')
+        self.assertEqual(self.container['d'].bar, u'd new')
+        self.assertEqual(self.container['a'].foo, u'c foo')
+        events = getEvents(IObjectModifiedEvent)
+        self.assertEqual([event.descriptions[0].attributes
+                          for event in events],
+                         [('foo',), ('foo', 'bar')])
+        rows = list(view.rows())
+        self.assertEqual(rows[0].foo_widget._getFormValue(), u'c new')
+
+    def test_update_errors(self):
+        request = TestRequest(form={
+            Update: '',
+            'row.61.foo': u'a new', 'row.61.bar': u'a bar',
+            'row.62.foo': u'', 'row.62.bar': u'b bar'})
+        view = GV(self.container, request)
+        self.assertEqual(view.update(), u'An error occurred.')
+        self.assertEqual(len(view.errors), 1)
+        rows = list(view.rows())
+        self.assertEqual(len(rows[1].errors), 1)
+        self.failUnless(transaction.get().isDoomed())
+        # the valid row is not applied either
+        self.assertEqual(self.container['a'].foo, u'c foo')
+        self.assertEqual(getEvents(IObjectModifiedEvent), [])
+
+def test_suite():
+    return unittest.makeSuite(Test)
+
+if __name__=='__main__':
+    unittest.main(defaultTest='test_suite')
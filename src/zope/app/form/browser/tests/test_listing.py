@@ -0,0 +1,178 @@
+##############################################################################
+#
+# Copyright (c) 2010 Zope Foundation and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""Listing View Tests
+
+$Id$
+"""
+import unittest
+from cStringIO import StringIO
+
+from zope import component
+from zope.component.testing import PlacelessSetup
+from zope.configuration.xmlconfig import xmlconfig, XMLConfig
+from zope.interface import Interface, implements
+from zope.publisher.browser import TestRequest
+from zope.schema import TextLine, Choice
+from zope.schema.interfaces import ITextLine, IChoice, IContextSourceBinder
+from zope.schema.vocabulary import SimpleVocabulary
+
+from zope.app.testing import ztapi
+
+from zope.formlib.interfaces import IDisplayWidget
+from zope.formlib.widget import DisplayWidget
+from zope.app.form.browser.listing import ListingView
+
+class I(Interface):
+    title = TextLine(title=u"Title")
+    size = TextLine(title=u"Size")
+
+class SizeBinder(object):
+    implements(IContextSourceBinder)
+
+    def __call__(self, context):
+        return SimpleVocabulary.fromValues([context.size])
+
+class IV(Interface):
+    size = Choice(title=u"Size", source=SizeBinder())
+
+class C(object):
+    implements(I, IV)
+
+    def __init__(self, title, size):
+        self.title = title
+        self.size = size
+
+class IContainer(Interface):
+    pass
+
+class Container(dict):
+    implements(IContainer)
+
+    def items(self):
+        return sorted(dict.items(self))
+
+class LV(ListingView):
+    schema = I
+
+class Test(PlacelessSetup, unittest.TestCase):
+
+    def setUp(self):
+        super(Test, self).setUp()
+        ztapi.browserViewProviding(ITextLine, DisplayWidget, IDisplayWidget)
+        self.container = Container(
+            a=C(u'<b>', u'3'), b=C(u'bee', u'1'), c=C(u'sea', u'2'))
+
+    def test_rows(self):
+        view = LV(self.container, TestRequest())
+        self.assertEqual([(row['key'], row['cells']) for row in view.rows()],
+                         [('a', [u'&lt;b&gt;', u'3']),
+                          ('b', [u'bee', u'1']),
+                          ('c', [u'sea', u'2'])])
+        self.assertEqual(view.titles(), [u'Title', u'Size'])
+
+    def test_bound_fields(self):
+        class V(ListingView):
+            schema = IV
+
+        class ChoiceWidget(DisplayWidget):
+            def __call__(self):
+                return u' '.join(self.context.vocabulary.by_value)
+
+        ztapi.browserViewProviding(IChoice, ChoiceWidget, IDisplayWidget)
+        view = V(self.container, TestRequest())
+        self.assertEqual([row['cells'] for row in view.rows()],
+                         [[u'3'], [u'1'], [u'2']])
+        # each cell has its own widget, bound to the row object
+        widgets = []
+        class RowWidget(DisplayWidget):
+            def __call__(self):
+                widgets.append(self)
+                return u''
+        ztapi.browserViewProviding(ITextLine, RowWidget, IDisplayWidget)
+        view = LV(self.container, TestRequest())
+        list(view.rows())
+        self.assertEqual(len(widgets), 6)
+        self.assertEqual(len(set(widgets)), 6)
+        self.assertEqual([widget.context.context for widget in widgets[::2]],
+                         [self.container[key] for key in 'abc'])
+
+    def test_sort_and_batch(self):
+        view = LV(self.container, TestRequest(form={'sort_on': 'size'}))
+        self.assertEqual([row['key'] for row in view.rows()],
+                         ['b', 'c', 'a'])
+        view.batch_size = 2
+        self.assertEqual([row['key'] for row in view.rows()], ['b', 'c'])
+        self.assertEqual(view.nextURL(),
+                         'http://127.0.0.1?batch_start=2&sort_on=size')
+        view = LV(self.container, TestRequest(form={
+            'sort_on': 'size', 'sort_order': 'reverse', 'batch_start': '2'}))
+        view.batch_size = 2
+        self.assertEqual([row['key'] for row in view.rows()], ['b'])
+        self.assertEqual(view.nextURL(), None)
+        self.assertEqual(
+            view.previousURL(),
+            'http://127.0.0.1?batch_start=0&sort_on=size&sort_order=reverse')
+        # the request values are quoted
+        view = LV(self.container, TestRequest(form={
+            'sort_on': u'"><x&y', 'batch_start': '2'}))
+        view.batch_size = 2
+        self.assertEqual(
+            view.previousURL(),
+            'http://127.0.0.1?batch_start=0&sort_on=%22%3E%3Cx%26y')
+
+    def test_call(self):
+        request = TestRequest()
+        result = LV(self.container, request)()
+        request.response.setResult(result)
+        body = request.response.consumeBody()
+        self.failUnless(body.startswith('<table class="listing">'), body)
+        view = LV(self.container, TestRequest())
+        view.label = u'Things'
+        self.assertEqual(list(view.renderChunks())[:3], [
+            u'<table class="listing">\n', u'<caption>Things</caption>\n',
+            u'<thead>\n<tr>'])
+        self.assertEqual(body.count('<tr>'), 4)
+        self.failUnless('<td>&lt;b&gt;</td><td>3</td>' in body, body)
+        self.assertEqual(request.response.getHeader('Content-Type'),
+                         'text/html;charset=utf-8')
+
+    def test_directive(self):
+        XMLConfig('meta.zcml', component)()
+        import zope.app.form.browser
+        XMLConfig('meta.zcml', zope.app.form.browser)()
+        xmlconfig(StringIO("""<configure
+           xmlns='http://namespaces.zope.org/zope'
+           xmlns:browser='http://namespaces.zope.org/browser'
+           i18n_domain='zope'>
+          <browser:schemalisting
+              for="zope.app.form.browser.tests.test_listing.IContainer"
+              schema="zope.app.form.browser.tests.test_listing.I"
+              name="listing.html"
+              fields="size"
+              batch_size="2"
+              sort_on="size"
+              sort_reverse="true"
+              permission="zope.Public" />
+          </configure>"""))
+        view = component.getMultiAdapter((self.container, TestRequest()),
+                                         name='listing.html')
+        self.assertEqual(view.__name__, 'listing.html')
+        self.assertEqual([(row['key'], row['cells']) for row in view.rows()],
+                         [('a', [u'3']), ('c', [u'2'])])
+
+def test_suite():
+    return unittest.makeSuite(Test)
+
+if __name__=='__main__':
+    unittest.main(defaultTest='test_suite')
@@ -0,0 +1,105 @@
+##############################################################################
+#
+# Copyright (c) 2010 Zope Foundation and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""Form Macros Tests
+
+$Id$
+"""
+import os
+import unittest
+
+from zope import component
+from zope.component.testing import PlacelessSetup
+from zope.interface import Interface
+from zope.publisher.browser import TestRequest
+from zope.publisher.interfaces.browser import IDefaultBrowserLayer
+from zope.browserpage.simpleviewclass import SimpleViewClass
+
+import zope.app.form.tests
+from zope.app.form.browser.macros import FormMacros
+
+template = os.path.join(os.path.dirname(zope.app.form.tests.__file__),
+                        'test_macros.pt')
+
+lookups = []
+
+def countingPage(class_):
+    def factory(context, request):
+        lookups.append(class_)
+        return class_(context, request)
+    return factory
+
+class NoMacros(object):
+    def __init__(self, context, request):
+        pass
+    def __getitem__(self, key):
+        raise KeyError(key)
+
+class WidgetMacros(NoMacros):
+    def __getitem__(self, key):
+        if key == 'widget_rows':
+            return 'rows'
+        raise KeyError(key)
+
+class Test(PlacelessSetup, unittest.TestCase):
+
+    def setUp(self):
+        super(Test, self).setUp()
+        del lookups[:]
+        self.register('view_macros', SimpleViewClass(template))
+        self.register('widget_macros', WidgetMacros)
+        self.register('addform_macros', NoMacros)
+
+    def register(self, name, class_):
+        component.provideAdapter(
+            countingPage(class_), (Interface, IDefaultBrowserLayer),
+            Interface, name)
+
+    def macros(self):
+        return FormMacros(object(), TestRequest())
+
+    def test_lookup(self):
+        page = self.macros()['page']
+        self.assertEqual(page, self.macros()['view'])
+        self.assertEqual(self.macros()['widget_rows'], 'rows')
+        self.assertRaises(KeyError, self.macros().__getitem__, 'missing')
+
+    def test_index(self):
+        self.macros()['page']
+        self.macros()['widget_rows']
+        self.assertRaises(KeyError, self.macros().__getitem__, 'missing')
+        count = len(lookups)
+        # pages registered with a template are not looked up again
+        self.macros()['page']
+        self.assertEqual(len(lookups), count)
+        self.assertRaises(KeyError, self.macros().__getitem__, 'missing')
+        self.assertEqual(len(lookups), count)
+        # other pages are looked up once
+        self.macros()['widget_rows']
+        self.assertEqual(len(lookups), count + 1)
+
+    def test_registration_changes(self):
+        self.assertRaises(KeyError, self.macros().__getitem__, 'other')
+        class OtherMacros(NoMacros):
+            def __getitem__(self, key):
+                if key == 'other':
+                    return 'other'
+                raise KeyError(key)
+        self.register('addform_macros', OtherMacros)
+        self.assertEqual(self.macros()['other'], 'other')
+
+def test_suite():
+    return unittest.makeSuite(Test)
+
+if __name__=='__main__':
+    unittest.main(defaultTest='test_suite')
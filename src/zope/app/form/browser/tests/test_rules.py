@@ -0,0 +1,125 @@
+##############################################################################
+#
+# Copyright (c) 2010 Zope Foundation and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""Validation Rules Tests
+
+$Id$
+"""
+import json
+import unittest
+from datetime import date
+
+from zope.component.testing import PlacelessSetup
+from zope.interface import Interface, implements
+from zope.publisher.browser import TestRequest
+from zope.publisher.interfaces import NotFound
+from zope.schema import TextLine, Int, Date, Choice, Bool
+from zope.schema.interfaces import IContextSourceBinder
+from zope.schema.vocabulary import SimpleVocabulary
+from zope.schema.interfaces import ITextLine
+
+from zope.app.testing import ztapi
+
+from zope.formlib.interfaces import IInputWidget
+from zope.app.form.browser import TextWidget
+from zope.app.form.browser.editview import EditView
+from zope.app.form.browser.rules import getValidationRules, RULES_NAME
+
+class I(Interface):
+    title = TextLine(title=u"Title", min_length=2, max_length=20)
+    size = Int(title=u"Size", min=1, max=10, required=False)
+    day = Date(title=u"Day", min=date(2010, 1, 1))
+    color = Choice(title=u"Color", values=(u'red', u'blue'))
+    flag = Bool(title=u"Flag", readonly=True)
+
+class IT(Interface):
+    title = TextLine(title=u"Title", max_length=20)
+
+class C(object):
+    implements(IT)
+    title = u'c title'
+
+class EV(EditView):
+    schema = IT
+    publish_validation_rules = True
+
+class PlainEV(EditView):
+    schema = IT
+
+class SourceBinder(object):
+    implements(IContextSourceBinder)
+
+    def __call__(self, context):
+        return SimpleVocabulary.fromValues([1, 2])
+
+class Test(PlacelessSetup, unittest.TestCase):
+
+    def test_rules(self):
+        rules = getValidationRules(I)
+        self.assertEqual(rules, [
+            {'name': 'title', 'type': 'TextLine', 'required': True,
+             'readonly': False, 'min_length': 2, 'max_length': 20},
+            {'name': 'size', 'type': 'Int', 'required': False,
+             'readonly': False, 'min': 1, 'max': 10},
+            {'name': 'day', 'type': 'Date', 'required': True,
+             'readonly': False, 'min': '2010-01-01'},
+            {'name': 'color', 'type': 'Choice', 'required': True,
+             'readonly': False, 'tokens': ['red', 'blue']},
+            {'name': 'flag', 'type': 'Bool', 'required': True,
+             'readonly': True},
+            ])
+        self.assertEqual([r['name'] for r in getValidationRules(
+            I, ['flag', 'size'])], ['flag', 'size'])
+        # the results can be changed by the caller
+        rules[0]['max_length'] = 5
+        self.assertEqual(getValidationRules(I)[0]['max_length'], 20)
+
+    def test_vocabularies(self):
+        from zope.app.form.browser import rules
+        class IV(Interface):
+            bound = Choice(title=u"Bound", source=SourceBinder())
+            named = Choice(title=u"Named", vocabulary='colors')
+            large = Choice(title=u"Large",
+                           values=range(rules.MAX_TOKENS + 1))
+        for field_rules in getValidationRules(IV):
+            self.failIf('tokens' in field_rules, field_rules)
+
+    def test_required_is_not_cached(self):
+        field = I['size']
+        self.failIf(getValidationRules(I, ['size'])[0]['required'])
+        field.required = True
+        try:
+            self.failUnless(getValidationRules(I, ['size'])[0]['required'])
+        finally:
+            field.required = False
+
+    def test_view(self):
+        ztapi.browserViewProviding(ITextLine, TextWidget, IInputWidget)
+        request = TestRequest()
+        view = EV(C(), request)
+        render = view.publishTraverse(request, RULES_NAME)
+        self.assertEqual(json.loads(render()), {'fields': [
+            {'name': 'title', 'type': 'TextLine', 'required': True,
+             'readonly': False, 'max_length': 20}]})
+        self.assertEqual(request.response.getHeader('Content-Type'),
+                         'application/json')
+        self.assertRaises(NotFound, view.publishTraverse, request, 'other')
+        # the rules are only published if the view says so
+        view = PlainEV(C(), request)
+        self.assertRaises(NotFound, view.publishTraverse, request, RULES_NAME)
+
+def test_suite():
+    return unittest.makeSuite(Test)
+
+if __name__=='__main__':
+    unittest.main(defaultTest='test_suite')
@@ -0,0 +1,133 @@
+##############################################################################
+#
+# Copyright (c) 2010 Zope Foundation and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""Form Timing Tests
+
+$Id$
+"""
+import unittest
+import transaction
+
+from zope.component.testing import PlacelessSetup
+from zope.publisher.browser import TestRequest
+from zope.schema.interfaces import ITextLine
+
+from zope.app.testing import ztapi
+
+from zope.app.form.browser import TextWidget
+from zope.app.form.browser.submit import Update
+from zope.app.form.browser.timing import Histogram, TimingAggregator
+from zope.app.form.browser.timing import setCollector, getCollector
+from zope.app.form.browser.timing import timedFields
+from zope.app.form.browser.tests.test_editview import EV, C
+from zope.formlib.interfaces import IInputWidget
+
+class Test(PlacelessSetup, unittest.TestCase):
+
+    def setUp(self):
+        super(Test, self).setUp()
+        ztapi.browserViewProviding(ITextLine, TextWidget, IInputWidget)
+        self.collector = TimingAggregator()
+        setCollector(self.collector)
+
+    def tearDown(self):
+        # errors doom the transaction
+        transaction.abort()
+        super(Test, self).tearDown()
+
+    def test_histogram(self):
+        histogram = Histogram()
+        for i in range(1, 101):
+            histogram.add(i / 1000.0)
+        self.assertEqual(histogram.count, 100)
+        self.assertEqual(histogram.min, 0.001)
+        self.assertEqual(histogram.max, 0.1)
+        # percentiles are at most a quarter octave off
+        for percent in (10, 50, 90):
+            value = histogram.percentile(percent)
+            self.failUnless(percent / 1000.0 <= value
+                            <= percent / 1000.0 * 2 ** 0.25, (percent, value))
+        self.assertEqual(histogram.percentile(100), 0.1)
+        self.assertEqual(Histogram().percentile(50), None)
+
+    def test_edit_view(self):
+        request = TestRequest()
+        request.form[Update] = ''
+        request.form['field.foo'] = u'r foo'
+        request.form['field.bar'] = u'r bar'
+        request.form['field.a'] = u'c a'
+        request.form['field.b'] = u'c b'
+        request.form['field.getbaz'] = u'r baz'
+        c = C()
+        v = EV(c, request)
+        v.incremental_refresh = True
+        v.update()
+        self.assertEqual((c.foo, c.bar, c.getbaz()),
+                         (u'r foo', u'r bar', u'r baz'))
+
+        self.assertEqual(self.collector.forms(), ['EV'])
+        statistics = self.collector.statistics('EV')
+        self.assertEqual(
+            sorted(set([phase for phase, field in statistics])),
+            ['apply', 'events', 'refresh', 'setup'])
+        # the phases are timed as a whole
+        self.assertEqual(sorted(statistics),
+                         [('apply', None), ('events', None),
+                          ('refresh', None), ('setup', None)])
+        for phase in ('setup', 'apply', 'refresh'):
+            self.assertEqual(statistics[phase, None]['count'], 1)
+        self.failUnless(statistics['setup', None]['p50'] > 0)
+
+    def test_timedFields(self):
+        calls = []
+        def func(context, names=None):
+            calls.append(names)
+            return names
+        v = EV(C(), TestRequest())
+        self.collector.clear()
+        # the function is called once for all fields
+        self.assertEqual(timedFields(v, 'setup', func, ['foo', 'bar'], 1),
+                         ['foo', 'bar'])
+        self.assertEqual(calls, [['foo', 'bar']])
+        self.assertEqual(self.collector.statistics('EV').keys(),
+                         [('setup', None)])
+        # a single field is also recorded by name
+        timedFields(v, 'setup', func, ['foo'], 1)
+        statistics = self.collector.statistics('EV')
+        self.assertEqual(statistics['setup', None]['count'], 2)
+        self.assertEqual(statistics['setup', 'foo']['count'], 1)
+
+    def test_edit_view_errors(self):
+        request = TestRequest()
+        request.form[Update] = ''
+        request.form['field.foo'] = u''
+        request.form['field.bar'] = u''
+        request.form['field.getbaz'] = u'r baz'
+        c = C()
+        v = EV(c, request)
+        v.update()
+        # the errors of all fields are reported
+        self.assertEqual(len(v.errors), 2)
+        self.assertEqual(c.getbaz(), u'r baz')
+
+    def test_off(self):
+        setCollector(None)
+        self.assertEqual(getCollector(), None)
+        EV(C(), TestRequest())
+        self.assertEqual(self.collector.forms(), [])
+
+def test_suite():
+    return unittest.makeSuite(Test)
+
+if __name__=='__main__':
+    unittest.main(defaultTest='test_suite')
@@ -64,7 +64,9 @@ class WidgetDirectiveTestCase(zope.component.testing.PlacelessSetup,
                               unittest.TestCase):
 
     def setUp(self):
+        from zope.app.form.browser.metaconfigure import customWidgetsReport
         super(WidgetDirectiveTestCase, self).setUp()
+        self.report = customWidgetsReport()
         zope.configuration.xmlconfig.file("widgetDirectives.zcml",
                                           zope.app.form.browser.tests)
 
@@ -88,6 +90,26 @@ class WidgetDirectiveTestCase(zope.component.testing.PlacelessSetup,
         self.assert_(zope.formlib.interfaces.IInputWidget.providedBy(w))
         self.assertEqual(w.extraAttr, "168")
 
+    def test_identical_widgets_share_mixin(self):
+        from zope.app.form.browser.metaconfigure import customWidgetsReport
+        request = zope.publisher.browser.TestRequest()
+        edit = zope.component.getMultiAdapter((Content(), request),
+                                              name="edit.html")
+        edit2 = zope.component.getMultiAdapter((Content(), request),
+                                               name="edit2.html")
+        # the mixin follows the view base class
+        mixin = type(edit).__bases__[-2]
+        self.assertEqual(mixin.__name__, "CustomWidgetsMixin")
+        self.failUnless(type(edit2).__bases__[-2] is mixin)
+        self.failIf(type(edit) is type(edit2))
+        self.assertEqual(edit2.field_widget.extraAttr, "84")
+        # the configuration added four forms sharing three mixins and
+        # three widget factories
+        report = customWidgetsReport()
+        self.assertEqual(
+            dict([(key, report[key] - self.report[key]) for key in report]),
+            {'forms': 4, 'mixins': 3, 'factories': 3})
+
 
 def test_suite():
     return unittest.makeSuite(WidgetDirectiveTestCase)
@@ -0,0 +1,224 @@
+##############################################################################
+#
+# Copyright (c) 2010 Zope Foundation and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""Timing of the phases of form views
+
+The form views report the wall time of their phases to the collector set
+with `setCollector`. By default there is none, and the views only pay
+for a global lookup per phase.
+
+A collector has a ``record(form, phase, field, seconds)`` method. `form`
+is the name of the view, `field` ``None`` for the time of the whole
+phase. Only a phase run for a single field, like setting up a lazy
+widget, is also recorded with the name of the field; the time of a phase
+run for several fields is not split up between them. The phases are:
+
+setup
+  setting up the widgets. The security checks and reading the field
+  values happen during this phase and are not timed on their own.
+
+validate
+  reading and validating the input of the widgets of an add form
+
+apply
+  validating the input and applying it to the object of an edit form
+
+events
+  sending the ``ObjectModifiedEvent`` of an edit form
+
+create
+  creating and adding the object of an add form, including the events
+
+save
+  storing the data of a form view with `setData`
+
+refresh
+  setting up the widgets of the changed fields again after an update
+
+render
+  rendering the template
+
+`TimingAggregator` is a collector keeping histograms in memory.
+
+$Id$
+"""
+__docformat__ = 'restructuredtext'
+
+import math
+import threading
+import time
+
+from zope.app.form.utility import _registerCleanUp
+
+_collector = None
+
+_timer = time.time
+
+def setCollector(collector):
+    """Sets the timing collector and returns the previous one.
+
+    Passing ``None`` turns timing off.
+    """
+    global _collector
+    old = _collector
+    _collector = collector
+    return old
+
+def getCollector():
+    """Returns the timing collector or ``None``."""
+    return _collector
+
+def formName(view):
+    """Returns the name the timings of `view` are recorded for.
+
+    This is the name views are registered with, or the class name of
+    views without a name.
+    """
+    return getattr(view, '__name__', None) or view.__class__.__name__
+
+def timed(view, phase, func, *args, **kw):
+    """Returns ``func(*args, **kw)``, recording the time it took."""
+    collector = _collector
+    if collector is None:
+        return func(*args, **kw)
+    start = _timer()
+    try:
+        return func(*args, **kw)
+    finally:
+        collector.record(formName(view), phase, None, _timer() - start)
+
+def timedFields(view, phase, func, names, *args, **kw):
+    """Returns ``func(*args, names=names, **kw)``, recording the time.
+
+    `func` is called once, as without timing. The time is recorded for
+    the phase, and also for the field if `names` holds a single name.
+    """
+    collector = _collector
+    if collector is None:
+        return func(names=names, *args, **kw)
+    start = _timer()
+    try:
+        return func(names=names, *args, **kw)
+    finally:
+        seconds = _timer() - start
+        form = formName(view)
+        collector.record(form, phase, None, seconds)
+        if names is not None and len(names) == 1:
+            collector.record(form, phase, names[0], seconds)
+
+
+class Histogram(object):
+    """Counts times in buckets a quarter octave wide.
+
+    Percentiles are estimated as the upper bound of the bucket they fall
+    in, which is at most 19% off.
+    """
+
+    # Bucket i holds the times in [unit * 2**(i/4), unit * 2**((i+1)/4))
+    unit = 1e-6
+    factor = 4 / math.log(2)
+
+    def __init__(self):
+        self.buckets = {}
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def add(self, seconds):
+        index = int(math.log(max(seconds, self.unit) / self.unit)
+                    * self.factor)
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.count += 1
+        self.total += seconds
+        if self.min is None or seconds < self.min:
+            self.min = seconds
+        if self.max is None or seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, percent):
+        """Returns the time below which `percent` of the times fall."""
+        if not self.count:
+            return None
+        rank = self.count * percent / 100.0
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                bound = self.unit * 2 ** ((index + 1) / 4.0)
+                return max(min(bound, self.max), self.min)
+        return self.max
+
+
+class TimingAggregator(object):
+    """A collector keeping a histogram per form, phase and field."""
+
+    percentiles = (50, 90, 99)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._forms = {}
+
+    def record(self, form, phase, field, seconds):
+        self._lock.acquire()
+        try:
+            histograms = self._forms.get(form)
+            if histograms is None:
+                histograms = self._forms[form] = {}
+            histogram = histograms.get((phase, field))
+            if histogram is None:
+                histogram = histograms[phase, field] = Histogram()
+            histogram.add(seconds)
+        finally:
+            self._lock.release()
+
+    def forms(self):
+        """Returns the names of the forms with timings."""
+        return sorted(self._forms)
+
+    def histogram(self, form, phase, field=None):
+        """Returns the histogram of a phase or field, or ``None``."""
+        return self._forms.get(form, {}).get((phase, field))
+
+    def statistics(self, form):
+        """Returns the statistics of the timings of a form.
+
+        The statistics map ``(phase, field)`` to a mapping with the
+        count, total, minimum and maximum times and the percentiles given
+        by the `percentiles` attribute (as ``p50`` and so on).
+        """
+        self._lock.acquire()
+        try:
+            result = {}
+            for key, histogram in self._forms.get(form, {}).items():
+                stats = result[key] = {
+                    'count': histogram.count, 'total': histogram.total,
+                    'min': histogram.min, 'max': histogram.max}
+                for percent in self.percentiles:
+                    stats['p%d' % percent] = histogram.percentile(percent)
+            return result
+        finally:
+            self._lock.release()
+
+    def clear(self):
+        self._lock.acquire()
+        try:
+            self._forms.clear()
+        finally:
+            self._lock.release()
+
+
+def _resetCollector():
+    setCollector(None)
+
+_registerCleanUp(_resetCollector)
@@ -0,0 +1,407 @@
+##############################################################################
+#
+# Copyright (c) 2010 Zope Foundation and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""Benchmarks for the form request lifecycle
+
+Run ``python -m zope.app.form.tests.benchmark --help`` (or the
+``benchmark`` script of the buildout) for the options. Like the tests,
+the benchmarks need the packages of the ``test`` extra.
+
+Each benchmark is run for synthetic schemas of text line fields, with
+plain and security proxied content where that matters. Proxied content
+is checked by the paranoid policy of ``zope.security`` on behalf of the
+system user, which is granted every permission. Results can be
+stored as JSON and compared with an earlier run; the minimum time per
+call is compared, as it is the least noisy.
+
+$Id$
+"""
+__docformat__ = 'restructuredtext'
+
+import gc
+import json
+import optparse
+import os
+import platform
+import sys
+import time
+from cStringIO import StringIO
+
+import zope.component
+import zope.component.testing
+from zope.interface import Interface, alsoProvides
+from zope.interface.interface import InterfaceClass
+from zope.publisher.browser import TestRequest
+from zope.publisher.interfaces.browser import IBrowserRequest
+from zope.publisher.interfaces.browser import IDefaultBrowserLayer
+from zope.schema import TextLine
+from zope.schema.interfaces import ITextLine
+from zope.security.checker import Checker, ProxyFactory
+from zope.security.management import newInteraction, endInteraction
+from zope.security.management import setSecurityPolicy, system_user
+from zope.security.simplepolicies import ParanoidSecurityPolicy
+from zope.browserpage.simpleviewclass import SimpleViewClass
+
+from zope.formlib.interfaces import IInputWidget, IDisplayWidget
+from zope.app.form.utility import setUpEditWidgets, getWidgetsData
+from zope.app.form.browser import TextWidget, DisplayWidget
+from zope.app.form.browser.add import AddView
+from zope.app.form.browser.editview import EditView
+from zope.app.form.browser.macros import FormMacros
+from zope.app.form.browser.submit import Update
+
+DEFAULT_SIZES = (10, 100, 1000)
+DEFAULT_THRESHOLD = 0.10
+
+def makeSchema(size):
+    """Returns a schema with `size` text line fields.
+
+    The schema is available as ``Schema<size>`` from this module, so that
+    it can be used in ZCML.
+    """
+    name = 'Schema%d' % size
+    schema = globals().get(name)
+    if schema is None:
+        attrs = {}
+        for i in range(size):
+            attrs['field%d' % i] = TextLine(title=u'Field %d' % i,
+                                            required=False)
+        schema = globals()[name] = InterfaceClass(
+            name, (Interface,), attrs, __module__=__name__)
+    return schema
+
+
+class Content(object):
+    """Content providing a synthetic schema"""
+
+    def __init__(self, schema, value=u'value'):
+        alsoProvides(self, schema)
+        for name in schema:
+            setattr(self, name, value)
+
+
+class Adding(object):
+
+    def __init__(self):
+        self.added = 0
+
+    def add(self, content):
+        self.added += 1
+        return content
+
+    def nextURL(self):
+        return 'next'
+
+
+class Participation(object):
+    principal = system_user
+    interaction = None
+
+
+def makeSource(schema, proxied):
+    ob = Content(schema)
+    if not proxied:
+        return ob
+    names = list(schema)
+    checker = Checker(dict.fromkeys(names, 'zope.View'),
+                      dict.fromkeys(names, 'zope.ManageContent'))
+    return ProxyFactory(ob, checker)
+
+
+def formData(schema, value):
+    form = {Update: u''}
+    for name in schema:
+        form['field.' + name] = value
+    return form
+
+
+def setUp():
+    zope.component.testing.setUp()
+    for iface, factory in ((IInputWidget, TextWidget),
+                           (IDisplayWidget, DisplayWidget)):
+        zope.component.provideAdapter(
+            factory, (ITextLine, IBrowserRequest), iface)
+    # the component set up resets the security policy
+    setSecurityPolicy(ParanoidSecurityPolicy)
+    newInteraction(Participation())
+
+def tearDown():
+    endInteraction()
+    zope.component.testing.tearDown()
+
+
+# Benchmarks. Each takes the size of the schema and a flag telling whether
+# the source is security proxied, sets up what it needs and returns the
+# function to time.
+
+class _View(object):
+
+    def __init__(self, context, request):
+        self.context = context
+        self.request = request
+
+def benchSetUpEditWidgets(size, proxied):
+    schema = makeSchema(size)
+    source = makeSource(schema, proxied)
+    def run():
+        setUpEditWidgets(_View(source, TestRequest()), schema,
+                         source=source)
+    return run
+
+def benchGetWidgetsData(size, proxied):
+    schema = makeSchema(size)
+    source = makeSource(schema, proxied)
+    form = formData(schema, u'new value')
+    def run():
+        view = _View(source, TestRequest(form=form))
+        setUpEditWidgets(view, schema, source=source)
+        getWidgetsData(view, schema)
+    return run
+
+def _editViewClass(schema):
+    return type('EditView', (EditView,), {'schema': schema})
+
+def benchEditViewGET(size, proxied):
+    schema = makeSchema(size)
+    source = makeSource(schema, proxied)
+    class_ = _editViewClass(schema)
+    def run():
+        class_(source, TestRequest()).update()
+    return run
+
+def benchEditViewPOST(size, proxied):
+    schema = makeSchema(size)
+    source = makeSource(schema, proxied)
+    class_ = _editViewClass(schema)
+    # alternate between two values, so that every update changes all fields
+    forms = [formData(schema, u'one'), formData(schema, u'two')]
+    def run():
+        forms.reverse()
+        view = class_(source, TestRequest(form=forms[0]))
+        view.update()
+        assert not view.errors
+    return run
+
+def benchAddViewPOST(size, proxied):
+    schema = makeSchema(size)
+    names = list(schema)
+    class_ = type('AddView', (AddView,), {
+        'schema': schema,
+        '_factory': lambda self: Content(schema, None),
+        '_arguments': (),
+        '_keyword_arguments': (),
+        '_set_before_add': names,
+        '_set_after_add': (),
+        })
+    context = Adding()
+    if proxied:
+        context = ProxyFactory(context, Checker(
+            {'add': 'zope.ManageContent', 'nextURL': 'zope.View'}))
+    form = formData(schema, u'new value')
+    def run():
+        view = class_(context, TestRequest(form=form))
+        view.update()
+        assert not view.errors
+    return run
+
+def benchFormMacros(size, proxied):
+    # The macro is found on the last page
+    from zope.app.form import browser
+    here = os.path.dirname(browser.__file__)
+    for name, filename in (('view_macros', 'display.pt'),
+                           ('widget_macros', 'edit.pt'),
+                           ('addform_macros', 'add.pt')):
+        zope.component.provideAdapter(
+            SimpleViewClass(os.path.join(here, filename)),
+            (Interface, IDefaultBrowserLayer), Interface, name)
+    context = Content(makeSchema(1))
+    def run():
+        FormMacros(context, TestRequest())['addform']
+    return run
+
+_zcml = """<configure
+   xmlns='http://namespaces.zope.org/zope'
+   xmlns:browser='http://namespaces.zope.org/browser'
+   i18n_domain='zope'>
+   <include package='zope.component' file='meta.zcml' />
+   <include package='zope.security' file='meta.zcml' />
+   <include package='zope.app.form.browser' file='meta.zcml' />
+   <include package='zope.browsermenu' file='meta.zcml' />
+   %s
+</configure>"""
+
+_editform = """
+   <browser:editform
+       schema='zope.app.form.tests.benchmark.Schema10'
+       name='edit%d.html'
+       permission='zope.Public'%s />
+"""
+
+def _benchZCML(size, deferred):
+    from zope.configuration.xmlconfig import xmlconfig
+    makeSchema(10)
+    extra = deferred and " deferred='true'" or ''
+    zcml = _zcml % ''.join([_editform % (i, extra) for i in range(size)])
+    def run():
+        zope.component.testing.tearDown()
+        zope.component.testing.setUp()
+        xmlconfig(StringIO(zcml))
+    return run
+
+def benchZCML(size, proxied):
+    return _benchZCML(size, False)
+
+def benchZCMLDeferred(size, proxied):
+    return _benchZCML(size, True)
+
+# (name, benchmark, run with a proxied source too, run for each size)
+BENCHMARKS = (
+    ('setUpEditWidgets', benchSetUpEditWidgets, True, True),
+    ('getWidgetsData', benchGetWidgetsData, True, True),
+    ('EditView.GET', benchEditViewGET, True, True),
+    ('EditView.POST', benchEditViewPOST, True, True),
+    ('AddView.POST', benchAddViewPOST, True, True),
+    ('FormMacros', benchFormMacros, False, False),
+    # the size is the number of directives
+    ('ZCML.editform', benchZCML, False, True),
+    ('ZCML.editform.deferred', benchZCMLDeferred, False, True),
+    )
+
+def timeit(func, repeat=5, mintime=0.02):
+    """Returns the times per call of `repeat` runs of `func`.
+
+    Each run calls `func` often enough to take at least `mintime` seconds.
+    """
+    number = 1
+    while True:
+        start = time.time()
+        for i in xrange(number):
+            func()
+        elapsed = time.time() - start
+        if elapsed >= mintime:
+            break
+        number *= 2
+    times = [elapsed / number]
+    gcold = gc.isenabled()
+    gc.disable()
+    try:
+        for i in range(repeat - 1):
+            start = time.time()
+            for i in xrange(number):
+                func()
+            times.append((time.time() - start) / number)
+    finally:
+        if gcold:
+            gc.enable()
+    return times
+
+def run(sizes=DEFAULT_SIZES, repeat=5, names=None, out=None):
+    """Runs the benchmarks and returns the results.
+
+    The results map benchmark names like ``EditView.POST/100/proxied`` to
+    the minimum, median and maximum time per call in seconds. If `names`
+    is given, only the benchmarks whose names start with one of them are
+    run. Progress is written to `out` if given.
+    """
+    results = {}
+    for name, bench, proxies, sized in BENCHMARKS:
+        if names and not [n for n in names if name.startswith(n)]:
+            continue
+        for size in sized and sizes or (None,):
+            for proxied in proxies and (False, True) or (False,):
+                key = name
+                if size is not None:
+                    key += '/%d' % size
+                if proxied:
+                    key += '/proxied'
+                setUp()
+                try:
+                    times = timeit(bench(size, proxied), repeat)
+                finally:
+                    tearDown()
+                times.sort()
+                results[key] = {'min': times[0],
+                                'median': times[len(times) // 2],
+                                'max': times[-1]}
+                if out is not None:
+                    print >> out, '%-40s %12.6f' % (key, times[0])
+    return {'meta': {'python': sys.version.split()[0],
+                     'platform': platform.platform(),
+                     'time': time.time(),
+                     'repeat': repeat,
+                     'sizes': list(sizes)},
+            'results': results}
+
+def compare(old, new, threshold=DEFAULT_THRESHOLD):
+    """Compares two runs and returns the regressions.
+
+    A regression is a benchmark of both runs whose minimum time grew by
+    more than `threshold` (a fraction). The regressions are returned as
+    ``(name, old time, new time)`` tuples, sorted by name.
+    """
+    old = old['results']
+    new = new['results']
+    regressions = []
+    for name in sorted(new):
+        if name in old:
+            before = old[name]['min']
+            after = new[name]['min']
+            if after > before * (1 + threshold):
+                regressions.append((name, before, after))
+    return regressions
+
+def main(args=None):
+    parser = optparse.OptionParser(
+        usage="%prog [options] [benchmark name prefix ...]")
+    parser.add_option(
+        '-s', '--sizes', default=','.join(map(str, DEFAULT_SIZES)),
+        help="Comma separated numbers of schema fields [%default]")
+    parser.add_option(
+        '-r', '--repeat', type='int', default=5,
+        help="Number of timed runs of each benchmark [%default]")
+    parser.add_option(
+        '-o', '--output', help="Store the results as JSON in this file")
+    parser.add_option(
+        '-c', '--compare', metavar='FILE',
+        help="Compare the results with those stored in FILE")
+    parser.add_option(
+        '-t', '--threshold', type='float', default=DEFAULT_THRESHOLD,
+        help="Slow down to report as regression [%default]")
+    options, names = parser.parse_args(args)
+    sizes = [int(size) for size in options.sizes.split(',')]
+
+    results = run(sizes, options.repeat, names, out=sys.stdout)
+    if options.output:
+        f = open(options.output, 'w')
+        try:
+            json.dump(results, f, indent=2, sort_keys=True)
+        finally:
+            f.close()
+    if options.compare:
+        f = open(options.compare)
+        try:
+            old = json.load(f)
+        finally:
+            f.close()
+        regressions = compare(old, results, options.threshold)
+        for name, before, after in regressions:
+            print 'REGRESSION %-40s %12.6f -> %12.6f (%+.0f%%)' % (
+                name, before, after, (after / before - 1) * 100)
+        if regressions:
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    # run the module, not __main__, so that the schemas can be imported
+    from zope.app.form.tests.benchmark import main
+    sys.exit(main())
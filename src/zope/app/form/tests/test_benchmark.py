@@ -0,0 +1,49 @@
+##############################################################################
+#
+# Copyright (c) 2010 Zope Foundation and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""Benchmark Tests
+
+$Id$
+"""
+import unittest
+
+from zope.app.form.tests import benchmark
+
+class Test(unittest.TestCase):
+
+    def tearDown(self):
+        from zope.testing.cleanup import cleanUp
+        cleanUp()
+
+    def test_run(self):
+        results = benchmark.run(sizes=(2,), repeat=1,
+                                names=['EditView.POST', 'FormMacros'])
+        self.assertEqual(sorted(results['results']),
+                         ['EditView.POST/2', 'EditView.POST/2/proxied',
+                          'FormMacros'])
+        self.assertEqual(results['meta']['sizes'], [2])
+
+    def test_compare(self):
+        old = {'results': {'a': {'min': 1.0}, 'b': {'min': 1.0},
+                           'c': {'min': 1.0}}}
+        new = {'results': {'a': {'min': 1.05}, 'b': {'min': 1.5},
+                           'd': {'min': 9.0}}}
+        self.assertEqual(benchmark.compare(old, new), [('b', 1.0, 1.5)])
+        self.assertEqual(benchmark.compare(old, new, 0.01),
+                         [('a', 1.0, 1.05), ('b', 1.0, 1.5)])
+
+def test_suite():
+    return unittest.makeSuite(Test)
+
+if __name__=='__main__':
+    unittest.main(defaultTest='test_suite')
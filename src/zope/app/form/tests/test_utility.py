@@ -35,7 +35,7 @@ from zope.formlib.interfaces import IWidgetFactory
 from zope.app.form.utility import no_value, setUpWidget, setUpWidgets
 from zope.app.form.utility import setUpEditWidgets, setUpDisplayWidgets
 from zope.app.form.utility import getWidgetsData, viewHasInput
-from zope.app.form.utility import applyWidgetsChanges
+from zope.app.form.utility import applyWidgetsChanges, getFieldPlan
 from zope.app.form.tests import utils
 
 request = TestRequest()
@@ -778,6 +778,100 @@ class TestFormSetUp(object):
         >>> tearDown()
         """
         
+    def test_setUpEditWidgets_authorization(self):
+        """Documents and tests the security checks of setUpEditWidgets.
+
+        >>> setUp()
+
+        When the source is protected by a plain checker, setUpEditWidgets
+        decides which fields can be changed by checking each permission
+        only once. We'll use a security policy that counts its checks:
+
+            >>> from zope.security.checker import Checker, CheckerPublic
+            >>> from zope.security.management import setSecurityPolicy
+            >>> from zope.security.management import newInteraction
+            >>> from zope.security.management import endInteraction
+            >>> from zope.security.simplepolicies import ParanoidSecurityPolicy
+            >>> checks = []
+            >>> class Policy(ParanoidSecurityPolicy):
+            ...     def checkPermission(self, permission, object):
+            ...         checks.append(permission)
+            ...         return permission != 'manage'
+            >>> oldpolicy = setSecurityPolicy(Policy)
+            >>> class Principal(object):
+            ...     id = 'bob'
+            >>> class Participation(object):
+            ...     interaction = None
+            ...     principal = Principal()
+            >>> newInteraction(Participation())
+
+            >>> checker = Checker(
+            ...     {'foo': 'view', 'bar': 'view', 'getBaz': 'view',
+            ...      'setBaz': 'edit', 'getAnotherBaz': 'view',
+            ...      'setAnotherBaz': 'manage', 'shazam': 'view'},
+            ...     {'foo': 'edit', 'bar': 'manage', 'shazam': CheckerPublic})
+            >>> source = zope.security.checker.Proxy(ExtendedContent(),
+            ...                                      checker)
+
+            >>> class InputWidget(Widget):
+            ...     implements(IInputWidget)
+            ...     def hasInput(self):
+            ...         return False
+            >>> class DisplayWidget(Widget):
+            ...     implements(IDisplayWidget)
+            >>> for iface in IFoo, IBar, IBaz:
+            ...     ztapi.browserViewProviding(
+            ...         iface, InputWidget, IInputWidget)
+            ...     ztapi.browserViewProviding(
+            ...         iface, DisplayWidget, IDisplayWidget)
+
+            >>> view = BrowserView(source, TestRequest())
+            >>> setUpEditWidgets(view, IExtendedContent, degradeInput=True)
+            ['foo', 'bar', 'getBaz', 'getAnotherBaz', 'shazam']
+            >>> names = ('foo', 'bar', 'getBaz', 'getAnotherBaz', 'shazam')
+            >>> for name in names:
+            ...     widget = getattr(view, name + '_widget')
+            ...     print name, IInputWidget.providedBy(widget)
+            foo True
+            bar False
+            getBaz True
+            getAnotherBaz False
+            shazam True
+
+        The field values are read through the proxy, which checks the 'view'
+        permission, but 'edit' and 'manage' were checked only once each:
+
+            >>> checks.count('edit'), checks.count('manage')
+            (1, 1)
+
+        The outcome is not kept beyond the call, so changed grants are
+        seen when the widgets are set up again:
+
+            >>> del checks[:]
+            >>> for name in getFieldPlan(IExtendedContent).names:
+            ...     delattr(view, name + '_widget')
+            >>> Policy.checkPermission = lambda self, permission, object: (
+            ...     checks.append(permission) or permission == 'view')
+            >>> setUpEditWidgets(view, IExtendedContent, degradeInput=True)
+            ['foo', 'bar', 'getBaz', 'getAnotherBaz', 'shazam']
+            >>> checks.count('edit'), checks.count('manage')
+            (1, 1)
+            >>> IInputWidget.providedBy(view.foo_widget)
+            False
+
+        Without degradeInput, Unauthorized is raised as before:
+
+            >>> view = BrowserView(source, TestRequest())
+            >>> setUpEditWidgets(view, IExtendedContent, names=['bar'])
+            Traceback (most recent call last):
+            ...
+            Unauthorized: bar
+
+            >>> endInteraction()
+            >>> ignored = setSecurityPolicy(oldpolicy)
+        >>> tearDown()
+        """
+
     def test_setUpDisplayWidgets(self):
         """Documents and tests setUpDisplayWidgets.
         
@@ -1006,6 +1100,72 @@ class TestForms(object):
         >>> tearDown()
         """
         
+class TestFieldPlan(object):
+
+    def test_getFieldPlan(self):
+        """Documents and tests getFieldPlan.
+
+        >>> setUp()
+
+        The form utilities look up the fields they work with in a field plan.
+        A plan lists the fields of a schema, or of a subset of its names,
+        in order:
+
+            >>> plan = getFieldPlan(IExtendedContent)
+            >>> plan.names
+            ('foo', 'bar', 'getBaz', 'getAnotherBaz', 'shazam')
+            >>> [name for name, field in plan]
+            ['foo', 'bar', 'getBaz', 'getAnotherBaz', 'shazam']
+            >>> getFieldPlan(IExtendedContent, ['shazam', 'foo']).names
+            ('shazam', 'foo')
+
+        Accessor fields are recorded with the name of their writer:
+
+            >>> for name, field, set_name in plan.entries:
+            ...     print name, set_name
+            foo None
+            bar None
+            getBaz setBaz
+            getAnotherBaz setAnotherBaz
+            shazam None
+
+        Plans are computed once per schema and names:
+
+            >>> getFieldPlan(IExtendedContent) is plan
+            True
+            >>> getFieldPlan(IExtendedContent, ()) is plan
+            True
+            >>> (getFieldPlan(IExtendedContent, ['foo'])
+            ...  is getFieldPlan(IExtendedContent, ('foo',)))
+            True
+
+        When the schema changes, its plans are computed again:
+
+            >>> class IMore(Interface):
+            ...     more = Foo()
+            >>> class ISchema(IContent):
+            ...     pass
+            >>> plan = getFieldPlan(ISchema)
+            >>> plan.names
+            ('foo', 'bar')
+            >>> ISchema.__bases__ = (IContent, IMore)
+            >>> getFieldPlan(ISchema) is plan
+            False
+            >>> getFieldPlan(ISchema).names
+            ('foo', 'bar', 'more')
+
+        The plans do not keep their schema alive:
+
+            >>> import gc, weakref
+            >>> ref = weakref.ref(ISchema)
+            >>> del ISchema, plan
+            >>> _ = gc.collect()
+            >>> ref() is None
+            True
+
+        >>> tearDown()
+        """
+
 class TestGetWidgetsData(object):
     
     def test_typical(self):
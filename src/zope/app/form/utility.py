@@ -34,14 +34,19 @@ $Id$
 """
 __docformat__ = 'restructuredtext'
 
+import weakref
+
 from zope import security
-from zope.security.proxy import Proxy
+from zope.security.checker import Checker, CheckerPublic
+from zope.security.management import queryInteraction
+from zope.security.proxy import Proxy, getChecker, removeSecurityProxy
 from zope.proxy import isProxy
 from zope.interface.interfaces import IMethod
 from zope.security.interfaces import ForbiddenAttribute, Unauthorized
 from zope.formlib.interfaces import WidgetsError, MissingInputError
 from zope.formlib.interfaces import InputErrors
 from zope.formlib.interfaces import IInputWidget, IDisplayWidget
+from zope.schema import getFieldsInOrder
 # BBB
 from zope.formlib.utility import (
     setUpWidget,
@@ -50,7 +55,186 @@ from zope.formlib.utility import (
     _fieldlist,
     no_value,
     _widgetHasStickyValue)
-    
+
+
+class FieldPlan(object):
+    """The precomputed, read-only list of fields a form works with.
+
+    A plan is computed once for a schema and an optional sequence of field
+    names (see `getFieldPlan`). Iterating over it yields ``(name, field)``
+    pairs, like `_fieldlist`.
+
+    `entries` holds ``(name, field, set_name)`` triples, where `set_name`
+    is the name of the writer method for accessor fields and ``None`` for
+    plain attributes.
+
+    Attributes that may be changed at runtime, such as `readonly` and
+    `required`, are not part of the plan; they are read from the field
+    each time.
+    """
+
+    __slots__ = ('schema', 'names', 'fields', 'entries', '__weakref__')
+
+    def __init__(self, schema, names=None):
+        if not names:
+            fields = getFieldsInOrder(schema)
+        else:
+            fields = [(name, schema[name]) for name in names]
+        entries = []
+        for name, field in fields:
+            set_name = None
+            if IMethod.providedBy(field) and field.writer is not None:
+                set_name = field.writer.__name__
+            entries.append((name, field, set_name))
+        self.schema = schema
+        self.names = tuple([name for name, field in fields])
+        self.fields = tuple(fields)
+        self.entries = tuple(entries)
+
+    def __iter__(self):
+        return iter(self.fields)
+
+    def __len__(self):
+        return len(self.fields)
+
+
+class _SchemaPlans(object):
+    """The plans computed for one schema, keyed by field names.
+
+    Instances subscribe to their schema, which calls `changed` whenever
+    the schema or one of its bases changes.
+    """
+
+    def __init__(self, schema):
+        self.plans = {}
+        schema.subscribe(self)
+
+    def changed(self, originally_changed):
+        self.plans.clear()
+
+# The plans of a schema are kept in an attribute of the schema, like the
+# attribute cache of zope.interface, as the fields of the plans refer to the
+# schema; a weak mapping holding them would keep its schemas alive. The
+# schemas with plans are tracked weakly for `_clearFieldPlans`.
+_plans_attribute = '_v_zope_app_form_plans'
+# {schema: None}
+_plans = weakref.WeakKeyDictionary()
+
+def getFieldPlan(schema, names=None):
+    """Returns the `FieldPlan` for `names` of `schema`.
+
+    If `names` is empty or ``None``, the plan covers all schema fields in
+    schema order. Plans are cached until the schema changes.
+    """
+    if names:
+        names = tuple(names)
+    else:
+        names = None
+    schema_plans = schema.__dict__.get(_plans_attribute)
+    if schema_plans is None:
+        schema_plans = _SchemaPlans(schema)
+        setattr(schema, _plans_attribute, schema_plans)
+        _plans[schema] = None
+    plan = schema_plans.plans.get(names)
+    if plan is None:
+        plan = schema_plans.plans[names] = FieldPlan(schema, names)
+    return plan
+
+def _clearFieldPlans():
+    for schema in list(_plans.keys()):
+        schema_plans = schema.__dict__.get(_plans_attribute)
+        if schema_plans is not None:
+            schema.unsubscribe(schema_plans)
+            delattr(schema, _plans_attribute)
+    _plans.clear()
+
+def _registerCleanUp(func):
+    # Registers `func`, which clears a cache or setting of this package,
+    # with zope.testing.cleanup if zope.testing is available
+    try:
+        from zope.testing.cleanup import addCleanUp
+    except ImportError:
+        return
+    addCleanUp(func)
+
+_registerCleanUp(_clearFieldPlans)
+
+def _authorizeWrites(source, plan):
+    """Decides in one pass which fields of `plan` may be changed on `source`.
+
+    `source` must be security proxied. Returns a mapping of field names to
+    booleans: a field is writable if the interaction may set its attribute
+    or, for accessor fields, access its writer method.
+
+    Only fields protected by a permission of a plain `Checker` are decided
+    here; each distinct permission is checked once per call. Outcomes are
+    not kept beyond the call, as grants may change; caching them is left
+    to the security policy. Other fields are left out and must be checked with
+    `canWrite` or `canAccess`, which also raise `ForbiddenAttribute` where
+    appropriate.
+    """
+    result = {}
+    checker = getChecker(source)
+    interaction = queryInteraction()
+    if type(checker) is not Checker or interaction is None:
+        return result
+
+    ob = removeSecurityProxy(source)
+    checked = {}
+
+    for name, field, set_name in plan.entries:
+        if field.readonly:
+            continue
+        if set_name is None:
+            permission = checker.setattr_permission_id(name)
+        else:
+            permission = checker.permission_id(set_name)
+        if permission is None:
+            continue
+        if permission is CheckerPublic:
+            result[name] = True
+            continue
+        try:
+            result[name] = checked[permission]
+        except KeyError:
+            result[name] = checked[permission] = bool(
+                interaction.checkPermission(permission, ob))
+    return result
+
+def _isWritable(source, name, set_name, writable):
+    # Tells whether the field `name` may be changed on the proxied `source`,
+    # given the outcome of `_authorizeWrites`
+    authorized = writable.get(name)
+    if authorized is None:
+        if set_name is None:
+            authorized = security.canWrite(source, name)
+        else:
+            authorized = security.canAccess(source, set_name)
+    return authorized
+
+def getUnwritableFields(source, schema, names=None):
+    """Returns the names of the fields that may not be changed on `source`.
+
+    These are the read-only fields and, if `source` is security proxied,
+    the fields the interaction may not set, in form order.
+    """
+    plan = getFieldPlan(schema, names)
+    security_proxied = isProxy(source, Proxy)
+    if security_proxied:
+        writable = _authorizeWrites(source, plan)
+    result = []
+    for name, field, set_name in plan.entries:
+        if field.readonly:
+            result.append(name)
+        elif security_proxied:
+            try:
+                authorized = _isWritable(source, name, set_name, writable)
+            except ForbiddenAttribute:
+                authorized = False
+            if not authorized:
+                result.append(name)
+    return result
+
 def setUpEditWidgets(view, schema, source=None, prefix=None,
                      ignoreStickyValues=False, names=None, context=None,
                      degradeInput=False, degradeDisplay=False):
@@ -79,9 +263,12 @@ def setUpEditWidgets(view, schema, source=None, prefix=None,
         context = view.context
     if source is None:
         source = view.context
+    plan = getFieldPlan(schema, names)
     security_proxied = isProxy(source, Proxy)
+    if security_proxied:
+        writable = _authorizeWrites(source, plan)
     res_names = []
-    for name, field in _fieldlist(names, schema):
+    for name, field, set_name in plan.entries:
         try:
             value = field.get(source)
         except ForbiddenAttribute:
@@ -97,18 +284,12 @@ def setUpEditWidgets(view, schema, source=None, prefix=None,
             viewType = IDisplayWidget
         else:
             if security_proxied:
-                is_accessor = IMethod.providedBy(field)
-                if is_accessor:
-                    set_name = field.writer.__name__
-                    authorized = security.canAccess(source, set_name)
-                else:
-                    set_name = name
-                    authorized = security.canWrite(source, name)
+                authorized = _isWritable(source, name, set_name, writable)
                 if not authorized:
                     if degradeInput:
                         viewType = IDisplayWidget
                     else:
-                        raise Unauthorized(set_name)
+                        raise Unauthorized(set_name or name)
                 else:
                     viewType = IInputWidget
             else:
@@ -148,7 +329,7 @@ def setUpDisplayWidgets(view, schema, source=None, prefix=None,
     if source is None:
         source = view.context
     res_names = []
-    for name, field in _fieldlist(names, schema):
+    for name, field in getFieldPlan(schema, names):
         try:
             value = field.get(source)
         except ForbiddenAttribute:
@@ -165,6 +346,76 @@ def setUpDisplayWidgets(view, schema, source=None, prefix=None,
         res_names.append(name)
     return res_names
 
+class LazyWidget(object):
+    """A view class attribute that sets up a widget when it is first used.
+
+    `name` is the field name; the descriptor is stored as ``<name>_widget``.
+    `factory` is the class attribute it replaces, usually an
+    `IWidgetFactory`, or ``None``.
+
+    On first access from a view set up with `setUpLazyWidgets`, the
+    view's ``_setUpWidget(name)`` method is called to set up the widget,
+    which is then stored on the view instance and found there on later
+    lookups. Other views, like those of subclasses that set up their
+    widgets at once, see `factory` as if the descriptor wasn't there.
+    """
+
+    def __init__(self, name, factory=None):
+        self.name = name
+        self.factory = factory
+
+    def __get__(self, inst, class_=None):
+        if inst is None:
+            return self
+        widgetName = self.name + '_widget'
+        if not inst.__dict__.get('_lazy_widgets_active'):
+            if self.factory is None:
+                raise AttributeError(widgetName)
+            return self.factory
+        # While the widget is set up, `setUpWidget` finds the original
+        # factory (or nothing) on the instance instead of this descriptor.
+        inst.__dict__[widgetName] = self.factory
+        try:
+            inst._setUpWidget(self.name)
+        except:
+            inst.__dict__.pop(widgetName, None)
+            raise
+        widget = inst.__dict__[widgetName]
+        if widget is self.factory:
+            # the widget was not set up, e.g. with `degradeDisplay`
+            del inst.__dict__[widgetName]
+            raise AttributeError(widgetName)
+        return widget
+
+def installLazyWidgets(class_, names):
+    """Makes the ``<name>_widget`` attributes of a view class lazy.
+
+    A `LazyWidget` is stored on `class_` for each of the field `names`
+    that doesn't have one yet. Existing widget factories are kept and used
+    by the lazy widgets. The names installed are remembered on `class_`
+    itself, so a class is only changed the first time its names are
+    installed.
+    """
+    installed = class_.__dict__.get('_lazy_widget_names', frozenset())
+    if installed.issuperset(names):
+        return
+    for name in names:
+        widgetName = name + '_widget'
+        factory = getattr(class_, widgetName, None)
+        if not isinstance(factory, LazyWidget):
+            setattr(class_, widgetName, LazyWidget(name, factory))
+    class_._lazy_widget_names = installed.union(names)
+
+def setUpLazyWidgets(view, names):
+    """Makes the widgets of the field `names` of `view` lazy.
+
+    The lazy widgets are installed on the class of `view`, see
+    `installLazyWidgets`, and are only used by the views set up with this
+    function.
+    """
+    installLazyWidgets(view.__class__, names)
+    view._lazy_widgets_active = True
+
 def viewHasInput(view, schema, names=None):
     """Returns ``True`` if the any of the view's widgets contain user input.
 
@@ -172,11 +423,41 @@ def viewHasInput(view, schema, names=None):
 
     `names` can be specified to provide a subset of these fields.
     """
-    for name, field in _fieldlist(names, schema):
+    for name, field in getFieldPlan(schema, names):
         if  getattr(view, name + '_widget').hasInput():
             return True
     return False
 
+def applyWidgetsChangedFields(view, schema, target=None, names=None):
+    """Updates an object with values from a view's widgets.
+
+    `view` contains the widgets that contain the new values. `schema` is the
+    form schema that corresponds to the view widgets. `target` is the object
+    to update, by default the view context. `names` can be specified to
+    update a subset of the schema fields.
+
+    Only widgets that have input are applied. Returns the names of the
+    fields that were changed, in form order. Raises `WidgetsError` with the
+    input errors of all widgets.
+    """
+    errors = []
+    changed = []
+    if target is None:
+        target = view.context
+
+    for name, field in getFieldPlan(schema, names):
+        widget = getattr(view, name + '_widget')
+        if IInputWidget.providedBy(widget) and widget.hasInput():
+            try:
+                if widget.applyChanges(target):
+                    changed.append(name)
+            except InputErrors, v:
+                errors.append(v)
+    if errors:
+        raise WidgetsError(errors)
+
+    return changed
+
 def getWidgetsData(view, schema, names=None):
     """Returns user entered data for a set of `schema` fields.
 
@@ -209,7 +490,7 @@ def getWidgetsData(view, schema, names=None):
     result = {}
     errors = []
 
-    for name, field in _fieldlist(names, schema):
+    for name, field in getFieldPlan(schema, names):
         widget = getattr(view, name + '_widget')
         if IInputWidget.providedBy(widget):
             if widget.hasInput():